@@ -3,14 +3,44 @@ CLI aracı - Kod üretimi için komut satırı arayüzü
 """
 
 import click
+import subprocess
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Proje kök dizinini ekle
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.model.deepseek import CodeGenius
+from src.model.deepseek import CodeGenius, safe_project_path
+from src.inference.daemon import (
+    DaemonServer, DaemonClient, connect, ensure_runtime_dir, SOCKET_PATH, LOG_PATH, RUNTIME_DIR
+)
+
+
+# Dosya yazan thread'lerin çıktıları birbirine karışmasın
+_echo_lock = threading.Lock()
+
+
+def _write_file(file_path, content, label):
+    """Dosyayı yaz (thread pool'da) ve tamamlandığını bildir"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    
+    with _echo_lock:
+        click.echo(f"✅ {label}")
+
+
+def load_genius(model_size, quantization):
+    """Aynı modelle çalışan daemon varsa onu, yoksa yerel modeli kullan"""
+    client = connect(model_size, quantization)
+    if client is not None:
+        click.echo(f"⚡ Daemon kullanılıyor: {SOCKET_PATH}")
+        return client
+    
+    return CodeGenius(model_size=model_size, quantization=quantization)
 
 
 @click.group()
@@ -25,26 +55,27 @@ def cli():
 @click.option('--output', '-o', help='Çıktı dosyası')
 @click.option('--max-tokens', '-t', default=2048, help='Maksimum token sayısı')
 @click.option('--temperature', '-T', default=0.7, help='Temperature (0-1)')
-@click.option('--quantization', '-q', default='4bit', help='Quantization (4bit, 8bit, none)')
+@click.option('--quantization', '-q', default='4bit', help='Quantization (4bit, 8bit, awq, none)')
 def generate(prompt, model_size, output, max_tokens, temperature, quantization):
     """Tek komutla kod üret"""
     
     click.echo(f"🚀 AI Code Genius başlatılıyor...")
-    click.echo(f"📦 Model: DeepSeek Coder {model_size}...\n    # Model yükle
+    click.echo(f"📦 Model: DeepSeek Coder {model_size}...")
+    
+    # Model yükle
     quant = None if quantization == 'none' else quantization
-    genius = CodeGenius(model_size=model_size, quantization=quant)
+    genius = load_genius(model_size, quant)
     
     click.echo(f"💭 Kod üretiliyor...")
     
-    # Kod üret
-    code = genius.generate(
-        prompt=prompt,
-        max_tokens=max_tokens,
-        temperature=temperature
-    )
-    
     # Çıktı
     if output:
+        code = genius.generate(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        
         with open(output, 'w', encoding='utf-8') as f:
             f.write(code)
         click.echo(f"✅ Kod '{output}' dosyasına kaydedildi!")
@@ -52,7 +83,16 @@ def generate(prompt, model_size, output, max_tokens, temperature, quantization):
         click.echo("\n" + "="*60)
         click.echo("📝 ÜRETILEN KOD:")
         click.echo("="*60 + "\n")
-        click.echo(code)
+        
+        # Token'ları üretildikçe yazdır
+        for chunk in genius.generate(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        ):
+            click.echo(chunk, nl=False)
+        
         click.echo("\n" + "="*60)
 
 
@@ -68,7 +108,7 @@ def project(description, tech, features, output_dir, model_size):
     click.echo(f"🚀 Proje üretiliyor: {description}")
     
     # Model yükle
-    genius = CodeGenius(model_size=model_size, quantization='4bit')
+    genius = load_genius(model_size, '4bit')
     
     # Parametreleri parse et
     tech_stack = [t.strip() for t in tech.split(',')]
@@ -80,27 +120,40 @@ def project(description, tech, features, output_dir, model_size):
     # Proje üret
     click.echo("💭 Proje oluşturuluyor (bu biraz zaman alabilir)...")
     
-    project_files = genius.generate_project(
-        description=description,
-        tech_stack=tech_stack,
-        features=feature_list
-    )
-    
-    # Dosyaları kaydet
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    for filepath, content in project_files.items():
-        file_path = output_path / filepath
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
-        
-        click.echo(f"✅ {filepath}")
+    # Dosyaları model ürettikçe kaydet; disk yazımı thread pool'da,
+    # model sonraki dosyayı üretirken yapılır
+    output_root = output_path.resolve()
+    writes = {}
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for filepath, content in genius.stream_project(
+            description=description,
+            tech_stack=tech_stack,
+            features=feature_list
+        ):
+            # Mutlak veya çıktı dizini dışına çıkan yollar yazılmaz
+            relative = safe_project_path(filepath)
+            target = (output_root / relative).resolve() if relative else None
+            if target is None or not target.is_relative_to(output_root):
+                click.echo(f"⚠️ Güvensiz dosya yolu atlandı: {filepath}", err=True)
+                continue
+            
+            # Aynı dosya tekrar üretildiyse son içerik kazanır; önceki yazım
+            # başlamadıysa iptal edilir, başladıysa bitmesi beklenir
+            previous = writes.get(target)
+            if previous is not None and not previous.cancel():
+                previous.result()
+            
+            writes[target] = executor.submit(_write_file, target, content, filepath)
+    
+    # Yazma hatalarını yüzeye çıkar
+    for write in writes.values():
+        write.result()
     
     click.echo(f"\n🎉 Proje '{output_dir}' dizininde oluşturuldu!")
-    click.echo(f"📁 Toplam {len(project_files)} dosya oluşturuldu")
+    click.echo(f"📁 Toplam {len(writes)} dosya oluşturuldu")
 
 
 @cli.command()
@@ -117,7 +170,7 @@ def refactor(code_file, requirements, output):
         code = f.read()
     
     # Model yükle
-    genius = CodeGenius(model_size='6.7b', quantization='4bit')
+    genius = load_genius('6.7b', '4bit')
     
     # İyileştir
     req_list = list(requirements) if requirements else [
@@ -156,7 +209,7 @@ def test(code_file, framework, output):
         code = f.read()
     
     # Model yükle
-    genius = CodeGenius(model_size='6.7b', quantization='4bit')
+    genius = load_genius('6.7b', '4bit')
     
     # Test üret
     test_code = genius.generate_tests(code, framework=framework)
@@ -173,6 +226,56 @@ def test(code_file, framework, output):
         click.echo(test_code)
 
 
+@cli.group()
+def daemon():
+    """Modeli bellekte tutan arka plan süreci"""
+    pass
+
+
+@daemon.command('start')
+@click.option('--model-size', '-m', default='6.7b', help='Model boyutu')
+@click.option('--quantization', '-q', default='4bit', help='Quantization (4bit, 8bit, awq, none)')
+@click.option('--foreground', is_flag=True, help='Arka plana atmadan çalıştır')
+def daemon_start(model_size, quantization, foreground):
+    """Modeli bir kez yükle ve komutları socket üzerinden dinle"""
+    
+    if not foreground:
+        if os.path.dirname(LOG_PATH) == RUNTIME_DIR:
+            ensure_runtime_dir()
+        
+        with open(LOG_PATH, 'a', encoding='utf-8') as log:
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), 'daemon', 'start',
+                 '-m', model_size, '-q', quantization, '--foreground'],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                start_new_session=True
+            )
+        click.echo(f"🚀 Daemon başlatılıyor (log: {LOG_PATH})")
+        return
+    
+    quant = None if quantization == 'none' else quantization
+    genius = CodeGenius(model_size=model_size, quantization=quant)
+    
+    server = DaemonServer(genius)
+    click.echo(f"✅ Daemon hazır: {SOCKET_PATH}")
+    
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+@daemon.command('stop')
+def daemon_stop():
+    """Çalışan daemon'ı durdur"""
+    try:
+        DaemonClient().call('shutdown')
+        click.echo("🛑 Daemon durduruldu")
+    except OSError:
+        click.echo("ℹ️ Çalışan daemon yok")
+
+
 def main():
     cli()
 
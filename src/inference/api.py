@@ -2,16 +2,22 @@
 FastAPI Server - REST API for Code Generation
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from typing import AsyncIterator, Callable, Iterator, List, Optional, Tuple
+import asyncio
+import json
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from src.model.deepseek import CodeGenius
+from src.model.deepseek import CodeGenius, ProjectFileStream
+from src.inference.batch import ContinuousBatcher, MicroBatcher
 
 app = FastAPI(
     title="AI Code Genius API",
@@ -28,8 +34,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global model
+# Global model ve istekleri birleştiren batcher
 genius = None
+batcher = None
+
+# "continuous": istekler her decode adımında aktif batch'e katılır;
+# varsayılan: pencere içinde gelenler tek generate çağrısında işlenir
+BATCHING = os.environ.get("CODEGENIUS_BATCHING", "micro")
+
+# Micro modda akışlar batcher'a girmez, kendi generate thread'inde çalışır;
+# GPU'da aynı anda en fazla bu kadar akış üretilir, diğerleri sıra bekler
+STREAM_CONCURRENCY = int(os.environ.get("CODEGENIUS_STREAM_CONCURRENCY", "1"))
+_stream_slots = asyncio.Semaphore(STREAM_CONCURRENCY)
 
 
 class CodeRequest(BaseModel):
@@ -37,6 +53,7 @@ class CodeRequest(BaseModel):
     max_tokens: int = 2048
     temperature: float = 0.7
     model_size: str = "6.7b"
+    stream: bool = False
 
 
 class ProjectRequest(BaseModel):
@@ -45,6 +62,7 @@ class ProjectRequest(BaseModel):
     features: List[str]
     architecture: str = "modular"
     model_size: str = "6.7b"
+    stream: bool = False
 
 
 class RefactorRequest(BaseModel):
@@ -61,11 +79,76 @@ class TestRequest(BaseModel):
     model_size: str = "6.7b"
 
 
+async def _sse(chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Metin parçalarını Server-Sent Events frame'lerine çevir"""
+    async for chunk in chunks:
+        yield f"data: {json.dumps({'token': chunk}, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+async def _ndjson_files(files: AsyncIterator[Tuple[str, str]]) -> AsyncIterator[str]:
+    """Tamamlanan her dosya için bir JSON satırı üret"""
+    async for file_path, content in files:
+        yield json.dumps({"path": file_path, "content": content}, ensure_ascii=False) + "\n"
+
+
+async def _until_disconnected(request: Request, items: AsyncIterator) -> AsyncIterator:
+    """İstemci ayrılınca akışı kapat; üretim (batch satırı / generate) durur"""
+    try:
+        async for item in items:
+            if await request.is_disconnected():
+                return
+            yield item
+    finally:
+        await items.aclose()
+
+
+async def _threaded_stream(make_items: Callable[[], Iterator]) -> AsyncIterator:
+    """
+    Senkron üretim iterator'ını thread pool'da, eşzamanlılık sınırıyla çalıştır
+    
+    Tokenize ve generate event loop'u bloklamaz; iterator kapatılınca
+    `CodeGenius._stream` generate thread'ini durdurur.
+    """
+    async with _stream_slots:
+        items = await run_in_threadpool(make_items)
+        try:
+            async for item in iterate_in_threadpool(items):
+                yield item
+        finally:
+            await run_in_threadpool(items.close)
+
+
+async def _batched_project_files(prompt: str) -> AsyncIterator[Tuple[str, str]]:
+    """Proje çıktısını batcher'dan akıt, tamamlanan dosyaları döndür"""
+    parser = ProjectFileStream()
+    chunks = batcher.stream(
+        prompt,
+        cache_prefix=genius.PROMPT_PREFIXES["project"],
+        **genius.TASK_PARAMS["project"]
+    )
+    try:
+        async for chunk in chunks:
+            for item in parser.feed(chunk):
+                yield item
+    finally:
+        await chunks.aclose()
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Model yükle"""
-    global genius
+    """Model yükle ve batch worker'ını başlat"""
+    global genius, batcher
     genius = CodeGenius(model_size="6.7b", quantization="4bit")
+    batcher = ContinuousBatcher(genius) if BATCHING == "continuous" else MicroBatcher(genius)
+    batcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Batch worker'ını durdur"""
+    if batcher is not None:
+        await batcher.stop()
 
 
 @app.get("/")
@@ -78,11 +161,31 @@ async def root():
 
 
 @app.post("/generate")
-async def generate_code(request: CodeRequest):
+async def generate_code(request: CodeRequest, http_request: Request):
     """Kod üret"""
+    if request.stream:
+        # Continuous modda akış aktif batch'e bir satır olarak katılır
+        if isinstance(batcher, ContinuousBatcher):
+            tokens = batcher.stream(
+                request.prompt,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature
+            )
+        else:
+            tokens = _threaded_stream(lambda: genius.generate(
+                prompt=request.prompt,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                stream=True
+            ))
+        return StreamingResponse(
+            _sse(_until_disconnected(http_request, tokens)),
+            media_type="text/event-stream"
+        )
+    
     try:
-        code = genius.generate(
-            prompt=request.prompt,
+        code, n_tokens = await batcher.submit(
+            request.prompt,
             max_tokens=request.max_tokens,
             temperature=request.temperature
         )
@@ -90,7 +193,7 @@ async def generate_code(request: CodeRequest):
         return {
             "success": True,
             "code": code,
-            "tokens": len(code.split())
+            "tokens": n_tokens
         }
         
     except Exception as e:
@@ -98,15 +201,37 @@ async def generate_code(request: CodeRequest):
 
 
 @app.post("/project")
-async def generate_project(request: ProjectRequest):
+async def generate_project(request: ProjectRequest, http_request: Request):
     """Proje üret"""
+    if request.stream:
+        if isinstance(batcher, ContinuousBatcher):
+            files = _batched_project_files(genius._project_prompt(
+                description=request.description,
+                tech_stack=request.tech_stack,
+                features=request.features,
+                architecture=request.architecture
+            ))
+        else:
+            files = _threaded_stream(lambda: genius.stream_project(
+                description=request.description,
+                tech_stack=request.tech_stack,
+                features=request.features,
+                architecture=request.architecture
+            ))
+        return StreamingResponse(
+            _ndjson_files(_until_disconnected(http_request, files)),
+            media_type="application/x-ndjson"
+        )
+    
     try:
-        files = genius.generate_project(
+        prompt = genius._project_prompt(
             description=request.description,
             tech_stack=request.tech_stack,
             features=request.features,
             architecture=request.architecture
         )
+        generated, _ = await batcher.submit(prompt, **genius.TASK_PARAMS["project"])
+        files = genius._parse_project_files(generated)
         
         return {
             "success": True,
@@ -122,11 +247,12 @@ async def generate_project(request: ProjectRequest):
 async def refactor_code(request: RefactorRequest):
     """Kod iyileştir"""
     try:
-        improved = genius.refactor(
+        prompt = genius._refactor_prompt(
             code=request.code,
             requirements=request.requirements,
             language=request.language
         )
+        improved, _ = await batcher.submit(prompt, **genius.TASK_PARAMS["refactor"])
         
         return {
             "success": True,
@@ -141,11 +267,12 @@ async def refactor_code(request: RefactorRequest):
 async def generate_tests(request: TestRequest):
     """Test üret"""
     try:
-        tests = genius.generate_tests(
+        prompt = genius._tests_prompt(
             code=request.code,
             framework=request.framework,
             coverage_target=request.coverage_target
         )
+        tests, _ = await batcher.submit(prompt, **genius.TASK_PARAMS["tests"])
         
         return {
             "success": True,
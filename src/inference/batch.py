@@ -0,0 +1,711 @@
+"""
+Toplu Üretim - Eşzamanlı istekleri tek model çağrısında birleştiren micro-batcher
+"""
+
+import asyncio
+import queue
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from transformers import DynamicCache
+
+# Bir batch'e alınacak maksimum istek sayısı
+MAX_BATCH = 8
+
+# İlk istekten sonra yeni istekler için beklenecek süre (ms)
+BATCH_WINDOW_MS = 10
+
+
+class MicroBatcher:
+    """
+    Eşzamanlı promptları toplayıp `CodeGenius.generate_batch` ile işler.
+    
+    Her istek `(prompt, params, future)` olarak kuyruğa konur; arka plandaki
+    worker `window_ms` süresince gelenleri prompt uzunluğuna göre 2'nin
+    kuvveti bucket'lara dağıtır. En dolu bucket'tan en fazla `max_batch`
+    istek alınır; böylece kısa promptlar uzun bir refactor isteğinin
+    padding'i ile birlikte işlenmez. Aynı sampling parametrelerine sahip
+    olanlar tek `generate` çağrısında çalıştırılır ve sonuçlar future'lara
+    dağıtılır.
+    """
+    
+    def __init__(
+        self,
+        genius,
+        max_batch: int = MAX_BATCH,
+        window_ms: float = BATCH_WINDOW_MS
+    ):
+        """
+        Args:
+            genius: Batch üretimi yapacak CodeGenius örneği
+            max_batch: Bir batch'teki maksimum istek sayısı
+            window_ms: Batch toplama penceresi (milisaniye)
+        """
+        self.genius = genius
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._worker = None
+        
+        # Uzunluk bucket'ı -> bekleyen istekler
+        self._buckets: Dict[int, Deque[Tuple]] = {}
+    
+    def start(self):
+        """Arka plan worker'ını başlat (çalışan bir event loop içinde)"""
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._batch_worker())
+    
+    async def stop(self):
+        """Worker'ı durdur"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    async def submit(
+        self,
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.7
+    ) -> Tuple[str, int]:
+        """
+        Promptu kuyruğa ekle ve sonucunu bekle
+        
+        Args:
+            prompt: Kod üretim talimatı
+            max_tokens: Maksimum token sayısı
+            temperature: Yaratıcılık seviyesi (0-1)
+            
+        Returns:
+            (üretilen kod, üretilen token sayısı)
+        """
+        future = asyncio.get_running_loop().create_future()
+        params = {"max_tokens": max_tokens, "temperature": temperature}
+        await self.queue.put((prompt, params, future))
+        return await future
+    
+    def _add(self, item: Tuple):
+        """İsteği prompt uzunluğunun bucket'ına ekle"""
+        # Karakter uzunluğu token sayısı için ucuz bir yaklaşım
+        bucket = 1 << len(item[0]).bit_length()
+        self._buckets.setdefault(bucket, deque()).append(item)
+    
+    async def _collect(self):
+        """
+        Kuyruktaki istekleri bucket'lara dağıt
+        
+        Bekleyen istek yoksa ilkini bekler ve pencere boyunca (veya bir
+        bucket dolana kadar) yenilerini toplar; varsa beklemeden yalnızca
+        kuyrukta birikenleri alır.
+        """
+        while not self.queue.empty():
+            self._add(self.queue.get_nowait())
+        
+        if self._buckets:
+            return
+        
+        loop = asyncio.get_running_loop()
+        self._add(await self.queue.get())
+        deadline = loop.time() + self.window
+        
+        while max(len(items) for items in self._buckets.values()) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                self._add(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+    
+    def _next_batch(self) -> List[Tuple]:
+        """En dolu bucket'tan en fazla `max_batch` istek al"""
+        bucket = max(self._buckets, key=lambda key: len(self._buckets[key]))
+        items = self._buckets[bucket]
+        batch = [items.popleft() for _ in range(min(len(items), self.max_batch))]
+        
+        if not items:
+            del self._buckets[bucket]
+        
+        return batch
+    
+    async def _batch_worker(self):
+        """Kuyruktan batch'ler oluşturup modele gönder"""
+        while True:
+            await self._collect()
+            batch = self._next_batch()
+            
+            # generate tek temperature aldığı için aynı değerleri grupla;
+            # iptal edilmiş (istemcisi kopmuş) istekleri atla
+            groups = {}
+            for prompt, params, future in batch:
+                if not future.done():
+                    groups.setdefault(params["temperature"], []).append(
+                        (prompt, params, future)
+                    )
+            
+            for temperature, items in groups.items():
+                await self._run_group(temperature, items)
+    
+    async def _run_group(self, temperature: float, items: List[Tuple]):
+        """Tek bir grup için bloklayan `generate_batch` çağrısını thread'de çalıştır"""
+        prompts = [prompt for prompt, _, _ in items]
+        max_tokens = [params["max_tokens"] for _, params, _ in items]
+        
+        try:
+            results = await asyncio.to_thread(
+                self.genius.generate_batch,
+                prompts,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                return_token_counts=True
+            )
+        except Exception as e:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[Exception] = None):
+    """Future'ı (event loop thread'inde) sonuçlandır; iptal edildiyse atla"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+def _cache_layers(cache: DynamicCache) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+    """Katman başına (key, value) tensörleri: [batch, heads, seq, head_dim]"""
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    return list(zip(cache.key_cache, cache.value_cache))
+
+
+def _build_cache(layers: List[Tuple[torch.Tensor, torch.Tensor]]) -> DynamicCache:
+    """Katman tensörlerinden yeni bir DynamicCache oluştur"""
+    cache = DynamicCache()
+    for layer_idx, (key, value) in enumerate(layers):
+        cache.update(key, value, layer_idx)
+    return cache
+
+
+class _Sequence:
+    """Continuous batching'de işlenen tek bir istek"""
+    
+    def __init__(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        future,
+        loop,
+        cache_prefix: Optional[str] = None,
+        chunks: Optional[asyncio.Queue] = None,
+        top_p: float = 0.95,
+        top_k: int = 50,
+        repetition_penalty: float = 1.0
+    ):
+        self.prompt = prompt
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.future = future
+        self.loop = loop
+        self.cache_prefix = cache_prefix
+        self.top_p = top_p
+        self.top_k = top_k
+        self.repetition_penalty = repetition_penalty
+        self.tokens: List[int] = []
+        
+        # Tekrar cezası için prompt token'ları (prefill'de atanır)
+        self.prompt_ids: Optional[torch.Tensor] = None
+        
+        # Akış modunda metin parçalarının gönderildiği kuyruk; decode
+        # penceresi her satır sonunda sıfırlanır (TextStreamer gibi)
+        self.chunks = chunks
+        self._line_start = 0
+        self._printed = 0
+    
+    def finished(self, eos_token_id: int) -> bool:
+        return self.tokens[-1] == eos_token_id or len(self.tokens) >= self.max_tokens
+    
+    def emit(self, tokenizer, final: bool = False):
+        """Akış modunda henüz gönderilmemiş metni istemciye ilet"""
+        if self.chunks is None:
+            return
+        
+        text = tokenizer.decode(self.tokens[self._line_start:], skip_special_tokens=True)
+        
+        # Yarım kalan çok baytlı karakter sonraki token'la tamamlanır
+        if not final and text.endswith("\ufffd"):
+            return
+        
+        new_text = text[self._printed:]
+        if text.endswith("\n"):
+            self._line_start = len(self.tokens)
+            self._printed = 0
+        else:
+            self._printed = len(text)
+        
+        if new_text:
+            self.loop.call_soon_threadsafe(self.chunks.put_nowait, new_text)
+    
+    def finish(self, tokenizer):
+        """Üretilen token'ları çöz ve sonucu istemciye ilet"""
+        tokens = self.tokens
+        if tokens and tokens[-1] == tokenizer.eos_token_id:
+            tokens = tokens[:-1]
+        
+        if self.chunks is not None:
+            self.emit(tokenizer, final=True)
+            self.loop.call_soon_threadsafe(self.chunks.put_nowait, None)
+        
+        code = tokenizer.decode(tokens, skip_special_tokens=True).strip()
+        self.loop.call_soon_threadsafe(_resolve, self.future, (code, len(tokens)))
+    
+    def fail(self, error: Exception):
+        if self.chunks is not None:
+            # Akışta hata kuyruk üzerinden iletilir; future yalnızca iptal işaretidir
+            self.loop.call_soon_threadsafe(self.chunks.put_nowait, error)
+            self.loop.call_soon_threadsafe(self.future.cancel)
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future, None, error)
+
+
+class ContinuousBatcher:
+    """
+    Iteration seviyesinde zamanlama ile continuous batching.
+    
+    `model.generate` yerine decode adımları ayrı bir thread'de elle
+    çalıştırılır: her adımda aktif dizilerin son token'ları tek forward'da
+    işlenir. Yeni gelen istekler prefill edilip bir sonraki adımda batch'e
+    katılır; biten diziler hemen çıkar, istemcisi batch'in geri kalanını
+    beklemez.
+    
+    KV cache sola padding'li tek bir batch tensörüdür; dizi çıktıkça
+    tamamen boşalan sol sütunlar kırpılır. `MicroBatcher` ile aynı
+    `start` / `stop` / `submit` arayüzüne sahiptir; `stream` ile her
+    istek kendi token'larını üretildikçe alabilir.
+    """
+    
+    def __init__(
+        self,
+        genius,
+        max_batch: int = MAX_BATCH,
+        top_p: float = 0.95,
+        top_k: int = 50,
+        idle_timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            genius: Modeli yüklenmiş CodeGenius örneği
+            max_batch: Aynı anda decode edilen maksimum dizi sayısı
+            top_p: Varsayılan nucleus sampling (istek başına değiştirilebilir)
+            top_k: Varsayılan top-k sampling (istek başına değiştirilebilir)
+            idle_timeout: Bu kadar saniye istek gelmezse decode thread'i
+                kapanır (yeni istekte yeniden açılır); None ise hep çalışır
+        """
+        self.genius = genius
+        self.max_batch = max_batch
+        self.top_p = top_p
+        self.top_k = top_k
+        self.idle_timeout = idle_timeout
+        self._incoming: queue.Queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Decode thread'ini başlat"""
+        with self._lock:
+            if self._thread is None:
+                self._running = True
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+    
+    def close(self):
+        """Decode thread'ini durdur ve bitmesini bekle (event loop dışından)"""
+        thread = self._thread
+        if thread is not None:
+            self._running = False
+            self._incoming.put(None)
+            thread.join()
+    
+    async def stop(self):
+        """Decode thread'ini durdur"""
+        await asyncio.to_thread(self.close)
+    
+    async def submit(
+        self,
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        cache_prefix: Optional[str] = None,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+        repetition_penalty: float = 1.0
+    ) -> Tuple[str, int]:
+        """
+        Promptu aktif batch'e katılmak üzere kuyruğa ekle ve sonucunu bekle
+        
+        Args:
+            prompt: Kod üretim talimatı
+            max_tokens: Maksimum token sayısı
+            temperature: Yaratıcılık seviyesi (0-1)
+            cache_prefix: Promptun KV cache'i önbellekte tutulan başlangıcı
+            top_p: Nucleus sampling (None: batcher varsayılanı)
+            top_k: Top-k sampling (None: batcher varsayılanı)
+            repetition_penalty: Tekrar cezası (1.0: kapalı)
+            
+        Returns:
+            (üretilen kod, üretilen token sayısı)
+        """
+        seq = self._sequence(prompt, max_tokens, temperature, cache_prefix, top_p, top_k, repetition_penalty)
+        self._enqueue(seq)
+        return await seq.future
+    
+    async def stream(
+        self,
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        cache_prefix: Optional[str] = None,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+        repetition_penalty: float = 1.0
+    ) -> AsyncIterator[str]:
+        """
+        Promptu aktif batch'e ekle, üretilen metni parça parça döndür
+        
+        Args:
+            prompt: Kod üretim talimatı
+            max_tokens: Maksimum token sayısı
+            temperature: Yaratıcılık seviyesi (0-1)
+            cache_prefix: Promptun KV cache'i önbellekte tutulan başlangıcı
+            top_p: Nucleus sampling (None: batcher varsayılanı)
+            top_k: Top-k sampling (None: batcher varsayılanı)
+            repetition_penalty: Tekrar cezası (1.0: kapalı)
+            
+        Returns:
+            Metin parçaları (async iterator)
+        """
+        seq = self._sequence(
+            prompt, max_tokens, temperature, cache_prefix, top_p, top_k, repetition_penalty,
+            chunks=asyncio.Queue()
+        )
+        self._enqueue(seq)
+        
+        try:
+            while True:
+                chunk = await seq.chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            # İstemci ayrıldıysa dizi bir sonraki adımda batch'ten çıkarılır
+            seq.future.cancel()
+    
+    def _sequence(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        cache_prefix: Optional[str],
+        top_p: Optional[float],
+        top_k: Optional[int],
+        repetition_penalty: float,
+        chunks: Optional[asyncio.Queue] = None
+    ) -> _Sequence:
+        """Çalışan event loop'a bağlı yeni bir istek oluştur"""
+        loop = asyncio.get_running_loop()
+        return _Sequence(
+            prompt,
+            max_tokens,
+            temperature,
+            loop.create_future(),
+            loop,
+            cache_prefix,
+            chunks,
+            top_p=self.top_p if top_p is None else top_p,
+            top_k=self.top_k if top_k is None else top_k,
+            repetition_penalty=repetition_penalty
+        )
+    
+    def _enqueue(self, seq: _Sequence):
+        """İsteği kuyruğa ekle; decode thread'i kapalıysa aç"""
+        self._incoming.put(seq)
+        self.start()
+    
+    def _exit_if_idle(self) -> bool:
+        """Kuyruk boşsa decode thread'ini kapatmak üzere işaretle"""
+        with self._lock:
+            if not self._incoming.empty():
+                return False
+            self._thread = None
+            return True
+    
+    def _loop(self):
+        """
+        Decode thread'i: zamanlayıcıyı çalıştır, beklenmeyen bir hatada
+        bekleyen istekleri hata ile bitir ve bir sonraki istek için
+        thread'in yeniden açılmasına izin ver
+        """
+        active: List[_Sequence] = []
+        try:
+            self._schedule(active)
+        except Exception as e:
+            self._fail_all(active, e)
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    self._thread = None
+            
+            # Hata işlenirken kuyruğa giren istekler yeni thread'de çalışır
+            if self._running and not self._incoming.empty():
+                self.start()
+    
+    def _schedule(self, active: List[_Sequence]):
+        """Zamanlayıcı: yeni istekleri al, bir decode adımı çalıştır, bitenleri çıkar"""
+        tokenizer = self.genius.tokenizer
+        kv, mask = None, None
+        
+        while self._running:
+            admitting = None
+            try:
+                # Boş slot varsa yeni istekleri prefill edip batch'e kat;
+                # aktif dizi yoksa ilk istek gelene kadar beklenir
+                while len(active) < self.max_batch:
+                    try:
+                        seq = self._incoming.get(block=not active, timeout=self.idle_timeout)
+                    except queue.Empty:
+                        if not active and self._exit_if_idle():
+                            return
+                        break
+                    
+                    if seq is None:
+                        break
+                    if seq.future.done():
+                        continue
+                    
+                    try:
+                        seq_kv, seq_mask = self._prefill(seq)
+                    except Exception as e:
+                        seq.fail(e)
+                        continue
+                    
+                    admitting = seq
+                    seq.emit(tokenizer)
+                    if seq.finished(tokenizer.eos_token_id):
+                        seq.finish(tokenizer)
+                    else:
+                        kv, mask = self._merge(kv, mask, seq_kv, seq_mask)
+                        active.append(seq)
+                    admitting = None
+                
+                if not active:
+                    continue
+                
+                tokens, kv, mask = self._step(active, kv, mask)
+                
+                # Biten ve istemcisi ayrılan (future iptal) diziler batch'ten çıkar
+                keep = []
+                for index, (seq, token) in enumerate(zip(active, tokens)):
+                    seq.tokens.append(token)
+                    seq.emit(tokenizer)
+                    if seq.finished(tokenizer.eos_token_id):
+                        seq.finish(tokenizer)
+                    elif not seq.future.done():
+                        keep.append(index)
+                
+                if len(keep) < len(active):
+                    kv, mask = self._select(kv, mask, keep)
+                    active[:] = [active[index] for index in keep]
+            except Exception as e:
+                # Adım, KV birleştirme veya çözme hatası (ör. OOM): batch'teki
+                # diziler hata ile biter, kuyruktaki istekler yeni batch'le sürer
+                failed = active + [admitting] if admitting is not None else active
+                for seq in failed:
+                    seq.fail(e)
+                active.clear()
+                kv, mask = None, None
+        
+        # stop(): yarıda kalan ve kuyrukta bekleyen istekler sonsuza dek
+        # beklemesin
+        self._fail_all(active, RuntimeError("Batcher durduruldu"))
+    
+    def _fail_all(self, active: List[_Sequence], error: Exception):
+        """Aktif ve kuyrukta bekleyen tüm istekleri hata ile bitir"""
+        for seq in active:
+            seq.fail(error)
+        active.clear()
+        
+        while True:
+            try:
+                seq = self._incoming.get_nowait()
+            except queue.Empty:
+                break
+            if seq is not None:
+                seq.fail(error)
+    
+    def _prefill(self, seq: _Sequence) -> Tuple[DynamicCache, torch.Tensor]:
+        """Yeni dizinin promptunu tek başına işle ve ilk token'ını örnekle"""
+        inputs, prefix_kv = self.genius._prepare_inputs([seq.prompt], seq.cache_prefix)
+        input_ids = inputs["input_ids"]
+        
+        seq.prompt_ids = input_ids[0]
+        
+        # Prefix'in KV'si önbellekten geliyorsa yalnızca kalan kısım işlenir
+        if prefix_kv is None:
+            prefix_kv = DynamicCache()
+        else:
+            input_ids = input_ids[:, prefix_kv.get_seq_length():]
+        
+        with torch.inference_mode():
+            outputs = self.genius.model(
+                input_ids=input_ids,
+                attention_mask=inputs["attention_mask"],
+                past_key_values=prefix_kv,
+                use_cache=True
+            )
+            seq.tokens.append(self._sample(outputs.logits[:, -1], [seq])[0])
+        
+        return outputs.past_key_values, inputs["attention_mask"]
+    
+    def _step(
+        self,
+        active: List[_Sequence],
+        kv: DynamicCache,
+        mask: torch.Tensor
+    ) -> Tuple[List[int], DynamicCache, torch.Tensor]:
+        """Tüm aktif diziler için tek decode adımı"""
+        input_ids = torch.tensor([[seq.tokens[-1]] for seq in active], device=mask.device)
+        
+        # Sola padding: yeni token'ın pozisyonu dizinin gerçek token sayısı
+        position_ids = mask.sum(dim=1, keepdim=True)
+        mask = torch.cat([mask, mask.new_ones((len(active), 1))], dim=1)
+        
+        with torch.inference_mode():
+            outputs = self.genius.model(
+                input_ids=input_ids,
+                attention_mask=mask,
+                position_ids=position_ids,
+                past_key_values=kv,
+                use_cache=True
+            )
+            tokens = self._sample(outputs.logits[:, -1], active)
+        
+        return tokens, outputs.past_key_values, mask
+    
+    def _sample(self, logits: torch.Tensor, sequences: List[_Sequence]) -> List[int]:
+        """
+        Satır başına tekrar cezası, temperature ve top-k / top-p sampling
+        (temperature ≤ GREEDY_TEMPERATURE: greedy, generate ile aynı eşik)
+        """
+        logits = logits.float()
+        
+        # Prompt veya üretimde geçen token'ların logit'i cezalandırılır
+        # (transformers RepetitionPenaltyLogitsProcessor ile aynı kural)
+        for row, seq in enumerate(sequences):
+            if seq.repetition_penalty != 1.0:
+                seen = torch.cat([seq.prompt_ids, seq.prompt_ids.new_tensor(seq.tokens)])
+                score = logits[row, seen]
+                logits[row, seen] = torch.where(
+                    score < 0,
+                    score * seq.repetition_penalty,
+                    score / seq.repetition_penalty
+                )
+        
+        greedy = torch.tensor(
+            [seq.temperature <= self.genius.GREEDY_TEMPERATURE for seq in sequences],
+            device=logits.device
+        )
+        if greedy.all():
+            return logits.argmax(dim=-1).tolist()
+        
+        temperatures = torch.tensor(
+            [seq.temperature for seq in sequences],
+            device=logits.device,
+            dtype=torch.float32
+        )
+        logits = logits / temperatures.clamp(min=1e-5).unsqueeze(1)
+        
+        # En büyük k ile tek topk; her satırda kendi k'sının ötesi atılır
+        vocab_size = logits.shape[-1]
+        top_ks = torch.tensor(
+            [min(seq.top_k or vocab_size, vocab_size) for seq in sequences],
+            device=logits.device
+        )
+        top_logits, top_ids = logits.topk(int(top_ks.max()), dim=-1)
+        ranks = torch.arange(top_logits.shape[-1], device=logits.device)
+        top_logits = top_logits.masked_fill(ranks >= top_ks.unsqueeze(1), float("-inf"))
+        probs = torch.softmax(top_logits, dim=-1)
+        
+        # Kümülatif olasılığı top_p'yi geçtikten sonraki token'ları at
+        top_ps = torch.tensor([seq.top_p for seq in sequences], device=logits.device)
+        probs[probs.cumsum(dim=-1) - probs > top_ps.unsqueeze(1)] = 0
+        
+        sampled = top_ids.gather(-1, torch.multinomial(probs, 1)).squeeze(-1)
+        tokens = torch.where(greedy, top_ids[:, 0], sampled)
+        
+        return tokens.tolist()
+    
+    def _merge(
+        self,
+        kv: Optional[DynamicCache],
+        mask: Optional[torch.Tensor],
+        new_kv: DynamicCache,
+        new_mask: torch.Tensor
+    ) -> Tuple[DynamicCache, torch.Tensor]:
+        """Yeni dizinin KV'sini aktif batch'e ekle (kısa olan sola padding'lenir)"""
+        if kv is None:
+            return new_kv, new_mask
+        
+        length = max(mask.shape[1], new_mask.shape[1])
+        pad = length - mask.shape[1]
+        new_pad = length - new_mask.shape[1]
+        
+        # [batch, heads, seq, head_dim]: seq boyutunun soluna padding
+        kv = _build_cache([
+            (
+                torch.cat([F.pad(key, (0, 0, pad, 0)), F.pad(new_key, (0, 0, new_pad, 0))]),
+                torch.cat([F.pad(value, (0, 0, pad, 0)), F.pad(new_value, (0, 0, new_pad, 0))])
+            )
+            for (key, value), (new_key, new_value) in zip(_cache_layers(kv), _cache_layers(new_kv))
+        ])
+        mask = torch.cat([F.pad(mask, (pad, 0)), F.pad(new_mask, (new_pad, 0))])
+        
+        return kv, mask
+    
+    def _select(
+        self,
+        kv: DynamicCache,
+        mask: torch.Tensor,
+        keep: List[int]
+    ) -> Tuple[Optional[DynamicCache], Optional[torch.Tensor]]:
+        """Biten dizileri batch'ten çıkar ve artık tamamen padding olan sütunları kırp"""
+        if not keep:
+            return None, None
+        
+        index = torch.tensor(keep, device=mask.device)
+        mask = mask.index_select(0, index)
+        start = int(mask.any(dim=0).int().argmax())
+        
+        kv = _build_cache([
+            (key.index_select(0, index)[:, :, start:], value.index_select(0, index)[:, :, start:])
+            for key, value in _cache_layers(kv)
+        ])
+        
+        return kv, mask[:, start:]
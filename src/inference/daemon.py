@@ -0,0 +1,256 @@
+"""
+Model Daemon - Modeli bir kez yükleyip UNIX socket üzerinden komut çalıştırır
+"""
+
+import inspect
+import json
+import os
+import socket
+import socketserver
+import stat
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Kullanıcıya özel çalışma dizini: systemd'nin XDG_RUNTIME_DIR'i (0700) veya
+# geçici dizinde kullanıcı id'li bir klasör; başka kullanıcılar socket'e
+# bağlanamaz ve onu önceden oluşturamaz
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(
+    tempfile.gettempdir(), f"codegenius-{os.getuid()}"
+)
+
+# Daemon socket'i ve arka plan log dosyası
+SOCKET_PATH = os.environ.get("CODEGENIUS_SOCKET", os.path.join(RUNTIME_DIR, "codegenius.sock"))
+LOG_PATH = os.environ.get("CODEGENIUS_LOG", os.path.join(RUNTIME_DIR, "codegenius.log"))
+
+# Daemon üzerinden çağrılabilecek CodeGenius metotları
+METHODS = ("generate", "generate_project", "stream_project", "refactor", "generate_tests")
+
+
+def ensure_runtime_dir(path: str = RUNTIME_DIR):
+    """
+    Çalışma dizinini 0700 oluştur; varsa bu kullanıcıya ait ve başkalarına
+    kapalı olduğunu doğrula
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"Güvensiz daemon dizini: {path}")
+
+
+def _is_alive(socket_path: str) -> bool:
+    """Socket'i dinleyen bir süreç var mı"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+            return True
+        except OSError:
+            return False
+
+
+def _owned_by_user(path: str) -> bool:
+    return os.lstat(path).st_uid == os.getuid()
+
+
+def _send(stream, message: Dict[str, Any]):
+    """Tek satırlık JSON mesajı gönder"""
+    stream.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    stream.flush()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Bağlantı başına tek istek: {method, args, kwargs}
+    
+    Yanıt: akış yapan metotlar için önce {chunk} satırları, en sonda
+    {result} veya {error} satırı.
+    """
+    
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            _send(self.wfile, {"error": f"Geçersiz istek: {e}"})
+            return
+        
+        for message in self.server.dispatch(request):
+            _send(self.wfile, message)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Yüklü bir CodeGenius örneğini socket üzerinden paylaşan sunucu"""
+    
+    daemon_threads = True
+    
+    def __init__(self, genius, socket_path: str = SOCKET_PATH):
+        """
+        Args:
+            genius: Yüklenmiş CodeGenius örneği
+            socket_path: Dinlenecek UNIX socket yolu
+        """
+        self.genius = genius
+        self.socket_path = socket_path
+        
+        # Tek model / tek GPU: üretim çağrıları sırayla çalışır
+        self.lock = threading.Lock()
+        
+        if os.path.dirname(socket_path) == RUNTIME_DIR:
+            ensure_runtime_dir()
+        
+        # Önceki çalışmadan kalan socket dosyasını temizle; çalışan bir
+        # daemon'ın veya başka kullanıcının socket'i devralınmaz
+        if os.path.lexists(socket_path):
+            if not _owned_by_user(socket_path):
+                raise PermissionError(f"Socket başka bir kullanıcıya ait: {socket_path}")
+            if _is_alive(socket_path):
+                raise RuntimeError(f"Daemon zaten çalışıyor: {socket_path}")
+            os.unlink(socket_path)
+        
+        # Socket dosyası yalnızca bu kullanıcı tarafından açılabilir (0600)
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+    
+    def dispatch(self, request: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """İsteği ilgili CodeGenius metoduna yönlendir, yanıt mesajlarını üret"""
+        method = request.get("method")
+        
+        if method == "info":
+            yield {"result": {
+                "model_size": self.genius.model_size,
+                "quantization": self.genius.quantization,
+            }}
+            return
+        
+        if method == "shutdown":
+            # serve_forever'ı başka bir thread'den durdurmak gerekir
+            threading.Thread(target=self.shutdown).start()
+            yield {"result": True}
+            return
+        
+        if method not in METHODS:
+            yield {"error": f"Bilinmeyen metot: {method}"}
+            return
+        
+        try:
+            with self.lock:
+                result = getattr(self.genius, method)(
+                    *request.get("args", []),
+                    **request.get("kwargs", {})
+                )
+                
+                # Akış: her parça üretildiği anda ayrı satır olarak gider
+                if inspect.isgenerator(result):
+                    for chunk in result:
+                        yield {"chunk": chunk}
+                    result = None
+            
+            yield {"result": result}
+        except Exception as e:
+            yield {"error": str(e)}
+    
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class DaemonClient:
+    """Daemon'daki modele CodeGenius ile aynı arayüzden erişen istemci"""
+    
+    def __init__(self, socket_path: str = SOCKET_PATH):
+        self.socket_path = socket_path
+    
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """Daemon'a istek gönder ve sonucu döndür"""
+        for message in self._request(method, *args, **kwargs):
+            if "result" in message:
+                return message["result"]
+    
+    def stream(self, method: str, *args, **kwargs) -> Iterator[Any]:
+        """Akış yapan bir metodu çağır, parçaları geldikçe döndür"""
+        for message in self._request(method, *args, **kwargs):
+            if "chunk" in message:
+                yield message["chunk"]
+    
+    def _request(self, method: str, *args, **kwargs) -> Iterator[Dict[str, Any]]:
+        """İsteği gönder, yanıt satırlarını sonuç gelene kadar oku"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            stream = sock.makefile("rwb")
+            _send(stream, {"method": method, "args": list(args), "kwargs": kwargs})
+            
+            for line in stream:
+                message = json.loads(line)
+                if "error" in message:
+                    raise RuntimeError(message["error"])
+                
+                yield message
+                
+                if "result" in message:
+                    return
+    
+    def generate(self, *args, **kwargs):
+        if kwargs.get("stream"):
+            return self.stream("generate", *args, **kwargs)
+        return self.call("generate", *args, **kwargs)
+    
+    def generate_project(self, *args, **kwargs) -> Dict[str, str]:
+        return self.call("generate_project", *args, **kwargs)
+    
+    def stream_project(self, *args, **kwargs) -> Iterator[Tuple[str, str]]:
+        for file_path, content in self.stream("stream_project", *args, **kwargs):
+            yield file_path, content
+    
+    def refactor(self, *args, **kwargs):
+        if kwargs.get("stream"):
+            return self.stream("refactor", *args, **kwargs)
+        return self.call("refactor", *args, **kwargs)
+    
+    def generate_tests(self, *args, **kwargs):
+        if kwargs.get("stream"):
+            return self.stream("generate_tests", *args, **kwargs)
+        return self.call("generate_tests", *args, **kwargs)
+
+
+def connect(
+    model_size: str,
+    quantization: Optional[str],
+    socket_path: str = SOCKET_PATH
+) -> Optional[DaemonClient]:
+    """
+    Aynı model ayarlarıyla çalışan bir daemon varsa istemci döndür
+    
+    Args:
+        model_size: İstenen model boyutu
+        quantization: İstenen quantization tipi
+        socket_path: Daemon socket yolu
+        
+    Returns:
+        DaemonClient veya daemon yoksa / farklı modelle çalışıyorsa None
+    """
+    if not os.path.exists(socket_path):
+        return None
+    
+    # Başka kullanıcının socket'ine kaynak kod gönderilmez
+    if not _owned_by_user(socket_path):
+        return None
+    
+    client = DaemonClient(socket_path)
+    try:
+        info = client.call("info")
+    except (OSError, RuntimeError):
+        # Kapanmış bir daemon'dan kalan socket
+        return None
+    
+    if info["model_size"] != model_size or info["quantization"] != quantization:
+        return None
+    
+    return client
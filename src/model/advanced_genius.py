@@ -7,8 +7,69 @@ import torch
 from typing import List, Dict, Optional, Tuple
 import re
 import ast
+import functools
+import json
+import logging
 from src.model.deepseek import CodeGenius
 
+logger = logging.getLogger(__name__)
+
+
+# Markdown kod bloğu çitleri (```python / ```)
+_MD_FENCE_RE = re.compile(r'```(?:python)?\n?')
+
+# Kodun başladığı ilk satır; öncesindeki açıklama metni atılır
+_CODE_START_RE = re.compile(r'^[^\S\n]*(?:import |from |class |def |@|#)', re.MULTILINE)
+
+# Başarısız kalite kontrolleri için yeniden üretim talimatları
+_CHECK_FEEDBACK = {
+    'valid_syntax': "Sözdizimi hatalarını düzelt, kod parse edilebilir olmalı",
+    'reasonable_length': "Eksik kalan kısımları tamamla",
+    'no_placeholder': "TODO/FIXME bırakma, tüm kısımları uygula",
+    'has_docstrings': "Eksik docstring'leri ekle (Google style)",
+    'has_type_hints': "Type hints ekle",
+    'has_error_handling': "Error handling ekle",
+}
+
+# try/except düğümleri (except* Python 3.11+)
+_TRY_NODES = (ast.Try, ast.TryStar) if hasattr(ast, 'TryStar') else (ast.Try,)
+
+# Plan + dosya yapısı + kodların tek çağrıda üretildiği çıktı şeması
+_PROJECT_SCHEMA = json.dumps({
+    "type": "object",
+    "properties": {
+        "plan": {"type": "string"},
+        "files": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "path": {"type": "string"},
+                    "description": {"type": "string"},
+                    "code": {"type": "string"}
+                },
+                "required": ["path", "description", "code"]
+            }
+        }
+    },
+    "required": ["plan", "files"]
+})
+
+# Tüm kod üretim promptlarında ortak kurallar
+_CODE_RULES = """
+ÖNEMLİ KURALLAR:
+1. Production-ready kod yaz
+2. Type hints kullan
+3. Docstring ekle (Google style)
+4. Error handling ekle
+5. Logging ekle
+6. Clean code prensiplerine uy
+7. SOLID prensipleri uygula
+8. Security best practices
+9. Performance optimize et
+10. Test edilebilir yaz
+"""
+
 
 class AdvancedCodeGenius(CodeGenius):
     """
@@ -23,6 +84,12 @@ class AdvancedCodeGenius(CodeGenius):
         super().__init__(*args, **kwargs)
         self.quality_threshold = 0.9
         self.max_retries = 3
+        self.file_batch_size = 8
+        self._project_generator = None
+        
+        # Aynı prompt ve parametrelerle tekrarlanan üretimler (retry'lar,
+        # dokümantasyon) modele gitmeden önceki sonucu döndürür
+        self._generate_cached = functools.lru_cache(maxsize=64)(self.generate)
     
     def generate_with_planning(
         self,
@@ -43,24 +110,32 @@ class AdvancedCodeGenius(CodeGenius):
         6. Kalite kontrolü
         """
         
-        # Step 1: Analiz
-        plan = self._create_plan(requirements, architecture)
+        # Step 1-3: outlines kuruluysa plan, yapı ve kod tek yapılandırılmış
+        # çağrıda üretilir; değilse adım adım
+        project = self._generate_structured_project(requirements, architecture)
         
-        # Step 2: Dosya yapısı
-        structure = self._design_structure(plan)
+        if project is not None:
+            plan, generated = project
+        else:
+            # Step 1: Analiz
+            plan = self._create_plan(requirements, architecture)
+            
+            # Step 2: Dosya yapısı
+            structure = self._design_structure(plan)
+            
+            # Step 3: Kod üretimi (dosyalar batch'ler halinde tek generate çağrısıyla)
+            generated = self._generate_files(structure, plan)
         
-        # Step 3: Kod üretimi (her dosya için)
         files = {}
-        for file_path, file_spec in structure.items():
-            code = self._generate_file(file_path, file_spec, plan)
-            
-            # Kalite kontrolü
-            if self._check_quality(code):
-                files[file_path] = code
-            else:
-                # Retry ile daha iyi kod
+        for file_path, file_spec, code in generated:
+            # Kalite kontrolü; geçemezse eksikler geri bildirilerek en fazla
+            # max_retries kez yeniden üretilir
+            for _ in range(self.max_retries):
+                if self._check_quality(code, file_path):
+                    break
                 code = self._regenerate_with_feedback(file_path, file_spec, code)
-                files[file_path] = code
+            
+            files[file_path] = code
         
         # Step 4: Testler
         if include_tests:
@@ -68,10 +143,84 @@ class AdvancedCodeGenius(CodeGenius):
             files.update(test_files)
         
         # Step 5: README ve dokümantasyon
-        files['README. md'] = self._generate_documentation(plan, files)
+        files['README.md'] = self._generate_documentation(plan, files)
+        
+        # Oturuma özel plan prefix'inin KV cache'ini serbest bırak
+        self.release_prefix(self._file_prompt_prefix(plan))
         
         return files
     
+    def _generate_structured_project(
+        self,
+        requirements: str,
+        architecture: str
+    ) -> Optional[Tuple[Dict, List[Tuple[str, Dict, str]]]]:
+        """
+        Plan, dosya yapısı ve dosya kodlarını tek JSON çıktısı olarak üret
+        
+        outlines ile sampling her adımda `_PROJECT_SCHEMA`'ya kısıtlanır;
+        plan/yapı promptlarının dosya başına yeniden prefill edilmesi ve
+        serbest metinden JSON ayrıştırma gerekmez.
+        
+        Returns:
+            (plan, [(dosya yolu, dosya özellikleri, kod)]) veya outlines
+            yoksa / üretim başarısızsa None
+        """
+        try:
+            import outlines
+        except ImportError:
+            return None
+        
+        # outlines 0.x API'si (1.x'te generate/samplers kaldırıldı); kurulu
+        # sürümle üretici kurulamazsa adım adım üretime dönülür
+        if self._project_generator is None:
+            try:
+                self._project_generator = outlines.generate.json(
+                    outlines.models.Transformers(self.model, self.tokenizer),
+                    _PROJECT_SCHEMA,
+                    sampler=outlines.samplers.multinomial(temperature=0.4)
+                )
+            except Exception as e:
+                logger.warning(f"outlines JSON üreticisi kurulamadı: {e}")
+                return None
+        
+        prompt = f"""
+Sen bir üst düzey yazılım mimarısın. Aşağıdaki gereksinimler için önce
+detaylı bir plan (analiz, bileşenler, teknik kararlar, riskler), ardından
+projenin tüm dosyalarını yaz.
+
+Gereksinimler:
+{requirements}
+
+Mimari: {architecture}
+{_CODE_RULES}
+Cevabı JSON olarak ver: "plan" alanına planı, "files" listesine her dosya
+için yolunu (path), sorumluluklarını (description) ve kodunu (code) yaz.
+"""
+        
+        try:
+            result = self._project_generator(
+                self._format_prompt(prompt),
+                max_tokens=self.TASK_PARAMS["project"]["max_tokens"]
+            )
+            
+            plan = {
+                'requirements': requirements,
+                'architecture': architecture,
+                'plan_text': result['plan']
+            }
+            generated = [
+                (item['path'], {"description": item['description']}, self._clean_code(item['code']))
+                for item in result['files']
+                if item['path'].strip()
+            ]
+        except Exception as e:
+            # Token limiti JSON'u yarıda kestiyse adım adım üretime dön
+            logger.warning(f"Yapılandırılmış proje üretimi başarısız: {e}")
+            return None
+        
+        return plan, generated
+    
     def _create_plan(self, requirements: str, architecture: str) -> Dict:
         """Detaylı proje planı oluştur"""
         
@@ -140,94 +289,175 @@ JSON formatında ver:
         
         # Parse JSON (basitleştirilmiş)
         try:
-            import json
             structure = json.loads(structure_text)
         except:
             # Fallback: basit yapı
             structure = {
-                "main. py": {"description": "Main application file"},
+                "main.py": {"description": "Main application file"},
                 "utils.py": {"description": "Utility functions"}
             }
         
         return structure
     
-    def _generate_file(
+    def _generate_files(
+        self,
+        structure: Dict[str, Dict],
+        plan: Dict
+    ) -> List[Tuple[str, Dict, str]]:
+        """
+        Tüm dosyaları batch'ler halinde üret
+        
+        Her batch tek `generate_batch` çağrısıdır; dosya başına ayrı
+        bs=1 decode yerine ağırlık okumaları batch'e yayılır.
+        
+        Returns:
+            (dosya yolu, dosya özellikleri, temizlenmiş kod) listesi
+        """
+        items = list(structure.items())
+        results = []
+        
+        for start in range(0, len(items), self.file_batch_size):
+            chunk = items[start:start + self.file_batch_size]
+            prompts = [
+                self._build_file_prompt(file_path, file_spec, plan)
+                for file_path, file_spec in chunk
+            ]
+            
+            codes = self.generate_batch(
+                prompts,
+                max_tokens=2000,
+                temperature=0.4,
+                cache_prefix=self._file_prompt_prefix(plan)
+            )
+            
+            for (file_path, file_spec), code in zip(chunk, codes):
+                results.append((file_path, file_spec, self._clean_code(code)))
+        
+        return results
+    
+    def _build_file_prompt(
         self,
         file_path: str,
         file_spec: Dict,
         plan: Dict
     ) -> str:
-        """Tek bir dosya için optimize edilmiş kod üret"""
+        """Dosya üretim promptunu oluştur (ortak plan prefix'i + dosyaya özel kısım)"""
         
-        prompt = f"""
+        return self._file_prompt_prefix(plan) + f"""
 Şu dosyayı yaz:  {file_path}
 
-Proje Planı:
-{plan['plan_text']}
-
 Dosya Özellikleri:
 {file_spec}
 
-ÖNEMLİ KURALLAR:
-1. Production-ready kod yaz
-2. Type hints kullan
-3. Docstring ekle (Google style)
-4. Error handling ekle
-5. Logging ekle
-6. Clean code prensiplerine uy
-7. SOLID prensipleri uygula
-8. Security best practices
-9. Performance optimize et
-10. Test edilebilir yaz
-
 SADECE KOD VER, açıklama ekleme: 
 """
+    
+    def _file_prompt_prefix(self, plan: Dict) -> str:
+        """
+        Tüm dosya promptlarında ortak olan baş kısım
         
-        code = self.generate(prompt, max_tokens=2000, temperature=0.4)
-        
-        # Kod temizleme
-        code = self._clean_code(code)
+        Plan ve kurallar promptun başında tutulur; böylece KV cache'i bir
+        kez hesaplanıp her dosya için yeniden kullanılabilir.
+        """
         
-        return code
+        return f"""
+Proje Planı:
+{plan['plan_text']}
+{_CODE_RULES}"""
     
-    def _check_quality(self, code: str) -> bool:
+    def _check_quality(self, code: str, file_path: str = "main.py") -> bool:
         """Kod kalitesini kontrol et"""
         
-        checks = {
-            'has_docstrings': '"""' in code or "'''" in code,
-            'has_type_hints': '->' in code or ': ' in code,
-            'has_error_handling': 'try:' in code or 'except' in code,
-            'reasonable_length': len(code) > 100,
-            'no_placeholder':  'TODO' not in code and 'FIXME' not in code
-        }
+        checks = self._quality_checks(code, file_path)
+        
+        # Parse edilemeyen kod doğrudan başarısız
+        if not checks.get('valid_syntax', True):
+            return False
         
         # En az %80 checks geçmeli
         score = sum(checks.values()) / len(checks)
         
         return score >= 0.8
     
+    def _quality_checks(self, code: str, file_path: str) -> Dict[str, bool]:
+        """
+        Kalite kontrollerini çalıştır (kontrol adı -> geçti mi)
+        
+        Python kodu bir kez parse edilir ve yapısal özellikler tek AST
+        taramasında toplanır; Python dışı dosyalar için yalnızca metin
+        kontrolleri yapılır.
+        """
+        
+        checks = {
+            'reasonable_length': len(code) > 100,
+            'no_placeholder': 'TODO' not in code and 'FIXME' not in code
+        }
+        
+        if not file_path.endswith('.py'):
+            return checks
+        
+        try:
+            tree = ast.parse(code)
+        except (SyntaxError, ValueError):
+            checks['valid_syntax'] = False
+            return checks
+        
+        has_docstrings = has_type_hints = has_error_handling = False
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                has_docstrings = has_docstrings or ast.get_docstring(node) is not None
+                if getattr(node, 'returns', None) is not None:
+                    has_type_hints = True
+            elif isinstance(node, (ast.arg, ast.AnnAssign)):
+                has_type_hints = has_type_hints or node.annotation is not None
+            elif isinstance(node, _TRY_NODES):
+                has_error_handling = True
+        
+        checks.update(
+            valid_syntax=True,
+            has_docstrings=has_docstrings,
+            has_type_hints=has_type_hints,
+            has_error_handling=has_error_handling
+        )
+        
+        return checks
+    
     def _regenerate_with_feedback(
         self,
         file_path: str,
         file_spec: Dict,
         previous_code: str
     ) -> str:
-        """Feedback ile kodu yeniden üret"""
+        """Başarısız kalite kontrollerini geri bildirerek kodu yeniden üret"""
+        
+        failed = [
+            _CHECK_FEEDBACK[name]
+            for name, passed in self._quality_checks(previous_code, file_path).items()
+            if not passed
+        ]
         
         feedback_prompt = f"""
-Şu kodu iyileştir: 
+Şu dosyanın kodunu iyileştir: {file_path}
+
+Dosya Özellikleri:
+{file_spec}
+
+Mevcut kod:
+```
+{previous_code}
+```
+
+Kalite kontrolünde eksik bulunanlar:
+{chr(10).join(f'- {item}' for item in failed)}
 
-İyileştirmeler:
-- Eksik docstring varsa ekle
-- Type hints ekle
-- Error handling güçlendir
+Ayrıca:
 - Daha temiz kod yaz
 - Best practices uygula
 
 İYİLEŞTİRİLMİŞ KOD: 
 """
         
-        improved = self.generate(feedback_prompt, max_tokens=2000, temperature=0.3)
+        improved = self._generate_cached(feedback_prompt, max_tokens=2000, temperature=0.3)
         
         return self._clean_code(improved)
     
@@ -245,95 +475,130 @@ SADECE KOD VER, açıklama ekleme:
 
 ```python
 {code}
-            test_code = self.generate(test_prompt, max_tokens=1500, temperature=0.4)
-            test_files[test_path] = self._clean_code(test_code)
-    
-    return test_files
+```
 
-def _generate_documentation(self, plan: Dict, files: Dict[str, str]) -> str:
-    """README ve dokümantasyon üret"""
-    
-    doc_prompt = f"""
-        readme = self.generate(doc_prompt, max_tokens=2000, temperature=0.5)
-    
-    return readme
+Edge case'leri ve hata durumlarını test et.
 
-def _clean_code(self, code: str) -> str:
-    """Kod temizleme ve formatlama"""
-    
-    # Markdown code block'ları temizle
-    code = re.sub(r'```python\n? ', '', code)
-    code = re.sub(r'```\n?', '', code)
-    
-    # Ekstra açıklamaları kaldır
-    lines = code.split('\n')
-    cleaned_lines = []
+SADECE TEST KODU VER:
+"""
+                
+                test_code = self.generate(test_prompt, max_tokens=1500, temperature=0.4)
+                test_files[test_path] = self._clean_code(test_code)
+        
+        return test_files
     
-    in_code = False
-    for line in lines:
-        # Kod satırlarını tut
-        if line.strip().startswith(('import ', 'from ', 'class ', 'def ', '@', '#', ' ', '\t')) or in_code:
-            cleaned_lines.append(line)
-            in_code = True
-        elif line.strip() == '':
-            cleaned_lines.append(line)
+    def _generate_documentation(self, plan: Dict, files: Dict[str, str]) -> str:
+        """README ve dokümantasyon üret"""
+        
+        doc_prompt = f"""
+Şu proje için detaylı bir README.md yaz:
+
+Gereksinimler:
+{plan['requirements']}
+
+Proje Planı:
+{plan['plan_text']}
+
+Dosyalar:
+{chr(10).join(f'- {file_path}' for file_path in files)}
+
+Kurulum, kullanım, proje yapısı ve örnekler bölümlerini ekle.
+"""
+        
+        readme = self._generate_cached(doc_prompt, max_tokens=2000, temperature=0.5)
+        
+        return readme
     
-    return '\n'.join(cleaned_lines).strip()
-
-def generate_optimized(
-    self,
-    prompt: str,
-    optimize_for: str = "quality",  # quality, speed, size
-    **kwargs
-) -> str:
-    """Optimizasyon hedefine göre kod üret"""
+    def _clean_code(self, code: str) -> str:
+        """Kod temizleme ve formatlama"""
+        
+        # Markdown code block'ları temizle
+        code = _MD_FENCE_RE.sub('', code)
+        
+        # Kodun başladığı ilk satırdan önceki açıklamaları kaldır
+        match = _CODE_START_RE.search(code)
+        if match is None:
+            return ''
+        
+        return code[match.start():].strip()
     
-    optimization_hints = {
-        "quality": "En yüksek kod kalitesi, best practices, SOLID prensipleri",
-        "speed": "Maximum performance, optimize edilmiş algoritmalar, caching",
-        "size":  "Minimal kod, compact ama okunabilir, az bağımlılık"
-    }
+    def generate_optimized(
+        self,
+        prompt: str,
+        optimize_for: str = "quality",  # quality, speed, size
+        **kwargs
+    ) -> str:
+        """Optimizasyon hedefine göre kod üret"""
+        
+        optimization_hints = {
+            "quality": "En yüksek kod kalitesi, best practices, SOLID prensipleri",
+            "speed": "Maximum performance, optimize edilmiş algoritmalar, caching",
+            "size":  "Minimal kod, compact ama okunabilir, az bağımlılık"
+        }
+        
+        enhanced_prompt = f"""
+{prompt}
+
+Optimizasyon hedefi: {optimization_hints.get(optimize_for, optimization_hints['quality'])}
+"""
+        
+        return self._clean_code(self.generate(enhanced_prompt, **kwargs))
     
-    enhanced_prompt = f"""
-              {current_code}
-           improved_code = self.generate(improve_prompt, temperature=0.3, max_tokens=2000)
+    def iterative_improve(
+        self,
+        code: str,
+        iterations: int = 3
+    ) -> Tuple[str, List[str]]:
+        """Kodu her turda farklı bir odakla adım adım iyileştir"""
         
-        if self._check_quality(improved_code):
-            improvements.append(f"Iteration {i+1}: {focus} iyileştirildi")
-            current_code = self._clean_code(improved_code)
+        focus_areas = ["okunabilirlik", "performans", "hata yönetimi"]
+        current_code = code
+        improvements = []
+        
+        for i in range(iterations):
+            focus = focus_areas[i % len(focus_areas)]
+            
+            improve_prompt = f"""
+Şu kodu {focus} açısından iyileştir:
+
+```python
+{current_code}
+```
+
+SADECE İYİLEŞTİRİLMİŞ KODU VER:
+"""
+            
+            improved_code = self._clean_code(
+                self.generate(improve_prompt, temperature=0.3, max_tokens=2000)
+            )
+            
+            # Markdown çitleri parse'ı bozmasın diye temizlenmiş kod kontrol edilir
+            if self._check_quality(improved_code):
+                improvements.append(f"Iteration {i+1}: {focus} iyileştirildi")
+                current_code = improved_code
+        
+        return current_code, improvements
+
+
+if __name__ == "__main__":
+    genius = AdvancedCodeGenius(model_size="6.7b", quantization="4bit")
     
-    return current_code, improvements
     # Planlı kod üretimi
-project = genius.generate_with_planning(
-    requirements="""
-    Bir task yönetim API'si: 
+    project = genius.generate_with_planning(
+        requirements="""
+    Bir task yönetim API'si:
     - Kullanıcı authentication
     - CRUD operasyonları
     - Task prioritization
     - Deadline tracking
     - Team collaboration
     """,
-    include_tests=True,
-    architecture="clean architecture"
-)
-
-for file_path, code in project. items():
-    print(f"\n{'='*60}")
-    print(f"📁 {file_path}")
-    print('='*60)
-    print(code[: 500])  # İlk 500 karakter
+        include_tests=True,
+        architecture="clean architecture"
+    )
     
-**Bu dosyayı ekleyin ve commit edin!  **
-
----
-
-## 🎯 Sonra Ne Yapacağız?
-
-Bu dosyayı ekledikten sonra, diğer dosyaları da tek tek ekleyeceğiz:
-
-1. ✅ `advanced_genius.py` (ŞİMDİ)
-2. ⏳ `fine_tune. py` (Sonra)
-3. ⏳ `code_quality.py` (Sonra)
-4. ⏳ Diğerleri... 
-
-**Hazır mısınız?** Dosyayı ekleyin, ben de sonraki dosyayı hazırlayayım!  🚀          
+    for file_path, code in project.items():
+        print(f"\n{'='*60}")
+        print(f"📁 {file_path}")
+        print('='*60)
+        print(code[:500])  # İlk 500 karakter
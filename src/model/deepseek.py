@@ -4,13 +4,132 @@ Kusursuz kod üretimi için ana model sınıfı
 """
 
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig
-from typing import Optional, List, Dict
+from transformers import (
+    AutoTokenizer, AutoModelForCausalLM, BitsAndBytesConfig, DynamicCache, StaticCache,
+    StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer,
+    LogitsProcessorList, RepetitionPenaltyLogitsProcessor, TemperatureLogitsWarper,
+    TopKLogitsWarper, TopPLogitsWarper
+)
+from typing import Optional, List, Dict, Iterator, Tuple, Union
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import PurePosixPath
+from threading import Event, Thread
+import copy
+import hashlib
 import logging
+import re
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# "=== DOSYA: yol ===" başlığından bir sonraki başlığa / "=== DOSYA SONU ==="
+# satırına kadar olan blok; sonu gelmemiş (yarım kalmış) dosya alınmaz
+_FILE_END = "=== DOSYA SONU ==="
+_FILE_RE = re.compile(
+    r'^=== DOSYA:([^\n]*)\n(.*?)\n?(?=^=== DOSYA(?::| SONU ===))',
+    re.DOTALL | re.MULTILINE
+)
+
+
+def safe_project_path(filepath: str) -> Optional[str]:
+    """
+    Model çıktısındaki dosya yolunu proje köküne göre göreli yola çevir
+    
+    Args:
+        filepath: "=== DOSYA: ... ===" başlığındaki yol
+        
+    Returns:
+        Göreli POSIX yolu; mutlak, sürücülü veya proje dışına (..) çıkan
+        yollar için None
+    """
+    path = PurePosixPath(filepath.replace("\\", "/"))
+    if not path.parts or path.is_absolute() or ".." in path.parts or ":" in path.parts[0]:
+        return None
+    
+    return str(path)
+
+
+class ProjectFileStream:
+    """
+    Parça parça gelen proje çıktısından tamamlanan dosyaları ayıkla
+    
+    `feed` her metin parçasından sonra o parçayla tamamlanan
+    (dosya yolu, içerik) çiftlerini döndürür; yarım dosya beklenir.
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self._parsed_until = 0
+    
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        self.text += chunk
+        
+        # Son parçayla tamamlanmış bir dosya sınırı yoksa tekrar tarama
+        window_start = max(self._parsed_until, len(self.text) - len(chunk) - len(_FILE_END))
+        if self.text.find("=== DOSYA", window_start) == -1:
+            return []
+        
+        files = []
+        for match in _FILE_RE.finditer(self.text, self._parsed_until):
+            file_path = match.group(1).replace('===', '').strip()
+            if file_path:
+                files.append((file_path, match.group(2)))
+            self._parsed_until = match.end()
+        
+        return files
+
+
+class _StopOnEvent(StoppingCriteria):
+    """Olay işaretlenince (akışın tüketicisi ayrıldı) üretimi durdur"""
+    
+    def __init__(self, event: Event):
+        self.event = event
+    
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class _RowTokenLimit(StoppingCriteria):
+    """Batch'teki her satırı kendi `max_new_tokens` sınırında bitir"""
+    
+    def __init__(self, prompt_len: int, limits: List[int], device):
+        self.prompt_len = prompt_len
+        self.limits = torch.tensor(limits, device=device)
+    
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        return (input_ids.shape[1] - self.prompt_len) >= self.limits
+
+
+@lru_cache(maxsize=32)
+def _logits_processors(
+    temperature: Optional[float],
+    top_p: float,
+    top_k: int,
+    repetition_penalty: float
+) -> LogitsProcessorList:
+    """
+    Sampling ayarlarına karşılık gelen logits işlemcileri
+    
+    Aynı ayarlar tek listeyi paylaşır; işlemciler durumsuz olduğundan
+    eşzamanlı üretimlerde de kullanılabilir. temperature None ise greedy
+    (yalnızca tekrar cezası uygulanır).
+    """
+    processors = LogitsProcessorList()
+    
+    if repetition_penalty != 1.0:
+        processors.append(RepetitionPenaltyLogitsProcessor(repetition_penalty))
+    
+    if temperature is not None:
+        if temperature != 1.0:
+            processors.append(TemperatureLogitsWarper(temperature))
+        if top_k:
+            processors.append(TopKLogitsWarper(int(top_k)))
+        if top_p < 1.0:
+            processors.append(TopPLogitsWarper(top_p))
+    
+    return processors
+
 
 class CodeGenius:
     """DeepSeek Coder tabanlı kod üretim motoru"""
@@ -22,22 +141,102 @@ class CodeGenius:
         "33b": "deepseek-ai/deepseek-coder-33b-instruct",
     }
     
+    # Önceden quantize edilmiş AWQ INT4 checkpoint'leri (dequant+GEMV kernelleri)
+    AWQ_VARIANTS = {
+        "1.3b": "TheBloke/deepseek-coder-1.3b-instruct-AWQ",
+        "6.7b": "TheBloke/deepseek-coder-6.7B-instruct-AWQ",
+        "33b": "TheBloke/deepseek-coder-33B-instruct-AWQ",
+    }
+    
+    # Görev bazlı üretim parametreleri (API batcher'ı da bunları kullanır)
+    TASK_PARAMS = {
+        "project": {"max_tokens": 8000, "temperature": 0.6},
+        "refactor": {"max_tokens": 3000, "temperature": 0.5},
+        "tests": {"max_tokens": 2000, "temperature": 0.4},
+    }
+    
+    # Görev promptlarının sabit talimat başlangıçları; KV cache'leri bir kez
+    # hesaplanıp her çağrıda yeniden kullanılır (bkz. build_prefix_cache)
+    PROMPT_PREFIXES = {
+        "project": """
+Aşağıdaki özelliklere sahip tam bir proje oluştur.
+
+Lütfen şunları içeren tam bir proje yapısı oluştur:
+1. Tüm gerekli dosyaları
+2. Düzgün klasör organizasyonu
+3. Her dosya için tam kod
+4. README ve dokümantasyon
+5. Test dosyaları
+6. Konfigürasyon dosyaları
+
+Her dosyayı şu formatta ver:
+=== DOSYA: dosya/yolu/isim.ext ===
+[kod içeriği]
+=== DOSYA SONU ===
+""",
+        "refactor": """
+Aşağıdaki kodu verilen gereksinimlere göre iyileştir.
+İyileştirilmiş, temiz ve profesyonel kod ver.
+""",
+        "tests": """
+Aşağıdaki kod için tam bir test dosyası yaz.
+
+Gereksinimler:
+- Edge case'leri test et
+- Mock'ları uygun şekilde kullan
+- Açıklayıcı test isimleri
+""",
+    }
+    
+    # Bu uzunluğun (prompt + üretim) üzerinde KV cache CPU'ya offload edilir
+    OFFLOAD_THRESHOLD = 4096
+    
+    # Bu temperature ve altında greedy decode yapılır (sampling kernel'leri atlanır)
+    GREEDY_TEMPERATURE = 0.05
+    
+    # Bellekte tutulacak maksimum prefix KV cache sayısı (LRU)
+    PREFIX_CACHE_SIZE = 4
+    
     def __init__(self,
         model_size: str = "6.7b",
         device: str = "auto",
         quantization: Optional[str] = "4bit",
-        custom_model_path: Optional[str] = None
+        custom_model_path: Optional[str] = None,
+        compile_model: bool = False,
+        offload_kv: bool = False,
+        draft_model_size: Optional[str] = None,
+        bnb_config: Optional[BitsAndBytesConfig] = None,
+        attn_implementation: Optional[str] = None,
+        max_memory: Optional[Dict[Union[int, str], str]] = None,
+        offload_folder: Optional[str] = None,
+        tokenizer=None
     ):
         """
         Args:
             model_size: Model boyutu (1.3b, 6.7b, 16b, 33b)
             device: Cihaz (auto, cuda, cpu)
-            quantization: Quantization tipi (None, 4bit, 8bit)
-            custom_model_path: Fine-tuned model yolu
+            quantization: Quantization tipi (None, 4bit, 8bit, awq)
+            custom_model_path: Fine-tuned model yolu (awq için quantize edilmiş)
+            compile_model: Statik KV cache + torch.compile kullan
+            offload_kv: Uzun üretimlerde KV cache'i CPU'ya offload et
+            draft_model_size: Speculative decoding için taslak model boyutu (örn. 1.3b)
+            bnb_config: 4bit/8bit için özel BitsAndBytesConfig (verilmezse varsayılan)
+            attn_implementation: Attention backend'i (flash_attention_2, sdpa,
+                eager); verilmezse donanıma göre seçilir
+            max_memory: Cihaz başına bellek sınırı (örn. {0: "22GiB", "cpu": "64GiB"});
+                sığmayan katmanlar CPU'ya yerleştirilir
+            offload_folder: CPU'ya da sığmayan ağırlıkların yazılacağı klasör
+            tokenizer: Aynı model için önceden yüklenmiş tokenizer (bkz.
+                load_tokenizer); verilmezse model yolundan yüklenir
         """
         self.model_size = model_size
         self.device = device
         self.quantization = quantization
+        self.compile_model = compile_model
+        self.offload_kv = offload_kv
+        
+        # Ortak prompt başlangıçları için KV cache (sha1 -> (input_ids, cache))
+        self._prefix_cache: "OrderedDict[str, Tuple[torch.Tensor, DynamicCache]]" = OrderedDict()
         
         # Model yolunu belirle
         if custom_model_path:
@@ -49,31 +248,190 @@ class CodeGenius:
         
         logger.info(f"Model yükleniyor: {model_name}")
         
-        # Tokenizer yükle
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        # Tokenizer quantization'dan bağımsızdır; hazır verilmişse yeniden yüklenmez
+        self.tokenizer = tokenizer or self.load_tokenizer(model_name)
         
-        # Quantization config
+        # Quantization config: NF4 + double quant (~0.4 bit/parametre tasarruf),
+        # fp16 compute (bf16 desteği olmayan tüketici GPU'larında da hızlı)
         quantization_config = None
-        if quantization == "4bit":
+        if quantization in ("4bit", "8bit") and bnb_config is not None:
+            quantization_config = bnb_config
+        elif quantization == "4bit":
             quantization_config = BitsAndBytesConfig(
                 load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.bfloat16,
+                bnb_4bit_compute_dtype=torch.float16,
                 bnb_4bit_use_double_quant=True,
                 bnb_4bit_quant_type="nf4"
             )
         elif quantization == "8bit":
             quantization_config = BitsAndBytesConfig(load_in_8bit=True)
         
-        # Model yükle
-        self.model = AutoModelForCausalLM.from_pretrained(
+        # GPU'ya sığmayan quantize katmanlar CPU'da fp32 çalışır
+        if quantization_config is not None and max_memory is not None:
+            quantization_config = copy.deepcopy(quantization_config)
+            quantization_config.llm_int8_enable_fp32_cpu_offload = True
+        
+        # Quantize edilmeyen katmanlar compute dtype ile aynı tipte tutulur
+        if quantization_config is None:
+            torch_dtype = torch.bfloat16
+        elif quantization_config.load_in_4bit:
+            torch_dtype = quantization_config.bnb_4bit_compute_dtype
+        else:
+            torch_dtype = torch.float16
+        
+        # Fused attention kernel'i (N² attention matrisi HBM'e yazılmaz)
+        if attn_implementation is None:
+            attn_implementation = self._attn_implementation()
+        device_map = self._device_map(device, max_memory)
+        
+        # Model yükle; low_cpu_mem_usage ağırlıkları önce CPU'da tam
+        # kopyalamadan (safetensors varsa mmap ile) doğrudan cihaza yükler
+        if quantization == "awq":
+            self.model = self._load_awq(model_size, custom_model_path, device_map, attn_implementation)
+        else:
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                quantization_config=quantization_config,
+                device_map=device_map,
+                max_memory=max_memory,
+                offload_folder=offload_folder,
+                low_cpu_mem_usage=True,
+                torch_dtype=torch_dtype,
+                attn_implementation=attn_implementation,
+                trust_remote_code=True
+            )
+        
+        # Üretim ayarları bir kez sabitlenir; çağrılar yalnızca değişenleri verir
+        self._pin_generation_config(self.model)
+        
+        # Statik cache ile sabit shape'ler -> tek CUDA graph; quantize (bnb, AWQ)
+        # kernel'leri graph break'e yol açtığından quantize modelde parçalı derlenir
+        if compile_model:
+            self.model.forward = torch.compile(
+                self.model.forward,
+                mode="reduce-overhead",
+                fullgraph=quantization is None
+            )
+            self._warmup_compile()
+        
+        # Speculative decoding: küçük model token önerir, büyük model tek
+        # forward'da doğrular (aynı DeepSeek Coder tokenizer'ı)
+        self.draft_model = None
+        if draft_model_size and draft_model_size != model_size:
+            draft_name = self.MODEL_VARIANTS.get(draft_model_size)
+            if not draft_name:
+                raise ValueError(f"Geçersiz taslak model boyutu: {draft_model_size}")
+            
+            logger.info(f"Taslak model yükleniyor: {draft_name}")
+            self.draft_model = AutoModelForCausalLM.from_pretrained(
+                draft_name,
+                device_map=device_map,
+                low_cpu_mem_usage=True,
+                torch_dtype=torch.float16,
+                attn_implementation=attn_implementation,
+                trust_remote_code=True
+            )
+            self._pin_generation_config(self.draft_model)
+        
+        logger.info("Model başarıyla yüklendi!")
+    
+    def _pin_generation_config(self, model):
+        """
+        Her çağrıda aynı olan üretim ayarlarını modelin config'ine yaz
+        
+        pad_token_id tanımsız olduğunda generate her çağrıda uyarı basar ve
+        eos/pad değerlerini yeniden doğrular.
+        """
+        generation_config = model.generation_config
+        generation_config.pad_token_id = self.tokenizer.pad_token_id
+        generation_config.eos_token_id = self.tokenizer.eos_token_id
+        generation_config.use_cache = True
+        generation_config.num_beams = 1
+    
+    @staticmethod
+    def load_tokenizer(model_name: str):
+        """
+        Model için tokenizer yükle
+        
+        Rust tabanlı fast tokenizer; batch üretimi için decoder-only
+        modellerde sola padding.
+        """
+        tokenizer = AutoTokenizer.from_pretrained(
             model_name,
-            quantization_config=quantization_config,
+            use_fast=True,
+            padding_side="left"
+        )
+        
+        if tokenizer.pad_token is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        
+        return tokenizer
+    
+    def _device_map(self, device: str, max_memory: Optional[Dict] = None):
+        """
+        from_pretrained için device_map
+        
+        Tek GPU'da "auto" yerine tüm modül GPU 0'a yerleştirilir; accelerate'in
+        katman dağıtım hesabı ve gereksiz CPU yerleşimi atlanır. Bellek sınırı
+        verilmişse model sığmayabilir; dağıtımı accelerate yapar.
+        """
+        if device == "auto" and max_memory is None and torch.cuda.device_count() == 1:
+            return {"": 0}
+        
+        return device
+    
+    def _attn_implementation(self) -> str:
+        """
+        Kullanılacak attention implementasyonu
+        
+        FlashAttention-2 Ampere (sm80) ve üstü GPU ile flash_attn paketi
+        gerektirir; aksi halde PyTorch SDPA kullanılır.
+        """
+        if torch.cuda.is_available() and torch.cuda.get_device_capability()[0] >= 8:
+            try:
+                import flash_attn  # noqa: F401
+                return "flash_attention_2"
+            except ImportError:
+                pass
+        
+        return "sdpa"
+    
+    def _load_awq(
+        self,
+        model_size: str,
+        custom_model_path: Optional[str],
+        device: Union[str, Dict],
+        attn_implementation: str
+    ):
+        """
+        AWQ INT4 modeli yükle
+        
+        Ağırlıklar VRAM'de paketli kalır; dequant+GEMV kernelleri bs=1
+        decode'da bitsandbytes'a göre daha az bellek trafiği yapar.
+        
+        transformers'ın yerel AWQ desteğiyle (kernel'ler autoawq'dan) ve
+        katmanlar fuse edilmeden yüklenir: AutoAWQ'nun fused attention'ı
+        kendi iç KV durumunu tutup `past_key_values`'u yok sayar ve bs=1
+        için boyutlanır; prefix cache, batch üretimi ve batcher çalışmaz.
+        """
+        try:
+            import awq  # noqa: F401
+        except ImportError:
+            raise ImportError("AWQ için autoawq gerekli: pip install autoawq")
+        
+        awq_name = custom_model_path or self.AWQ_VARIANTS.get(model_size)
+        if not awq_name:
+            raise ValueError(f"AWQ checkpoint'i bulunamadı: {model_size}")
+        
+        # Quantization ayarları checkpoint'in config'inden gelir
+        return AutoModelForCausalLM.from_pretrained(
+            awq_name,
             device_map=device,
-            torch_dtype=torch.bfloat16 if quantization is None else None,
+            low_cpu_mem_usage=True,
+            torch_dtype=torch.float16,
+            attn_implementation=attn_implementation,
             trust_remote_code=True
         )
-        
-        logger.info("Model başarıyla yüklendi!")
     
     def generate(
         self,
@@ -82,9 +440,13 @@ class CodeGenius:
         temperature: float = 0.7,
         top_p: float = 0.95,
         top_k: int = 50,
+        repetition_penalty: float = 1.0,
         num_return_sequences: int = 1,
-        stop_sequences: Optional[List[str]] = None
-    ) -> str:
+        stop_sequences: Optional[List[str]] = None,
+        cache_prefix: Optional[str] = None,
+        stream: bool = False,
+        return_token_count: bool = False
+    ) -> Union[str, Tuple[str, int], Iterator[str]]:
         """
         Kod üretimi
         
@@ -94,47 +456,189 @@ class CodeGenius:
             temperature: Yaratıcılık seviyesi (0-1)
             top_p: Nucleus sampling
             top_k: Top-k sampling
+            repetition_penalty: Tekrar cezası (1.0: kapalı)
             num_return_sequences: Üretilecek kod sayısı
             stop_sequences: Durma dizileri
+            cache_prefix: Promptun çağrılar arasında ortak olan başı; KV'si
+                bir kez hesaplanıp sonraki çağrılarda yeniden kullanılır
+            stream: True ise metni üretildikçe parça parça döndüren iterator
+            return_token_count: True ise (kod, üretilen token sayısı) döndür
             
         Returns:
-            Üretilen kod
+            Üretilen kod (stream=True ise metin parçaları iterator'ı)
         """
-        # Prompt formatla
-        formatted_prompt = self._format_prompt(prompt)
+        # Prompt formatla + tokenize
+        inputs, prefix_kv = self._prepare_inputs([prompt], cache_prefix)
         
-        # Tokenize
-        inputs = self.tokenizer(
-            formatted_prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=4096
-        ).to(self.model.device)
+        # Assisted generation (bs=1) kendi dinamik cache'ini yönetir
+        assisted = self.draft_model is not None and num_return_sequences == 1
+        
+        if prefix_kv is not None:
+            generate_kwargs = {"past_key_values": prefix_kv}
+        elif assisted:
+            generate_kwargs = {}
+        else:
+            generate_kwargs = self._cache_kwargs(
+                num_return_sequences,
+                inputs["input_ids"].shape[1] + max_tokens
+            )
+        
+        if assisted:
+            generate_kwargs.update(
+                assistant_model=self.draft_model,
+                num_assistant_tokens=5
+            )
+        
+        generate_kwargs.update(
+            max_new_tokens=max_tokens,
+            num_return_sequences=num_return_sequences,
+            **self._sampling_kwargs(temperature, top_p, top_k, repetition_penalty)
+        )
+        
+        if stream:
+            return self._stream(inputs, generate_kwargs)
+        
+        # Generate
+        with torch.inference_mode():
+            outputs = self.model.generate(**inputs, **generate_kwargs)
+        
+        # Decode (prompt token'ları hariç)
+        new_tokens = outputs[0][inputs["input_ids"].shape[1]:]
+        code = self.tokenizer.decode(new_tokens, skip_special_tokens=True).strip()
+        
+        if return_token_count:
+            return code, self._generated_lengths(new_tokens.unsqueeze(0))[0]
+        
+        return code
+    
+    def _stream(
+        self,
+        inputs: Dict[str, torch.Tensor],
+        generate_kwargs: Dict
+    ) -> Iterator[str]:
+        """Üretimi arka thread'de çalıştır, metni geldikçe döndür"""
+        streamer = TextIteratorStreamer(
+            self.tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True
+        )
+        errors = []
+        
+        # Iterator kapatılırsa (istemci ayrıldı) üretim bir sonraki adımda durur
+        stop = Event()
+        generate_kwargs = dict(generate_kwargs, stopping_criteria=StoppingCriteriaList([_StopOnEvent(stop)]))
+        
+        def run():
+            try:
+                with torch.inference_mode():
+                    self.model.generate(**inputs, **generate_kwargs, streamer=streamer)
+            except Exception as e:
+                # Tüketicinin sonsuza kadar beklememesi için akışı kapat
+                errors.append(e)
+                streamer.end()
+        
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        
+        try:
+            for chunk in streamer:
+                if chunk:
+                    yield chunk
+        finally:
+            stop.set()
+        
+        thread.join()
+        if errors:
+            raise errors[0]
+    
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_tokens: Union[int, List[int]] = 2048,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        top_k: int = 50,
+        repetition_penalty: float = 1.0,
+        cache_prefix: Optional[str] = None,
+        return_token_counts: bool = False
+    ) -> Union[List[str], List[Tuple[str, int]]]:
+        """
+        Birden fazla prompt için tek `model.generate` çağrısıyla kod üretimi
+        
+        Promptlar sola padding'lenip tek batch olarak işlenir; model
+        ağırlıkları her decode adımında tüm istekler için bir kez okunur.
+        
+        Args:
+            prompts: Kod üretim talimatları
+            max_tokens: Maksimum token sayısı (tek değer veya prompt başına liste)
+            temperature: Yaratıcılık seviyesi (0-1)
+            top_p: Nucleus sampling
+            top_k: Top-k sampling
+            repetition_penalty: Tekrar cezası (1.0: kapalı)
+            cache_prefix: Tüm promptların ortak başlangıcı (bkz. `generate`)
+            return_token_counts: True ise her prompt için (kod, token sayısı)
+            
+        Returns:
+            Her prompt için üretilen kod (aynı sırada)
+        """
+        if isinstance(max_tokens, int):
+            max_tokens = [max_tokens] * len(prompts)
+        
+        # Prompt formatla + tokenize (sola padding)
+        inputs, prefix_kv = self._prepare_inputs(prompts, cache_prefix)
+        
+        if prefix_kv is not None:
+            generate_kwargs = {"past_key_values": prefix_kv}
+        else:
+            generate_kwargs = self._cache_kwargs(
+                len(prompts),
+                inputs["input_ids"].shape[1] + max(max_tokens)
+            )
+        
+        # Limiti dolan satırlar biter; tüm satırlar bitince (EOS veya kendi
+        # limiti) döngü en uzun limiti beklemeden sonlanır
+        if len(set(max_tokens)) > 1:
+            generate_kwargs["stopping_criteria"] = StoppingCriteriaList([
+                _RowTokenLimit(inputs["input_ids"].shape[1], max_tokens, self.model.device)
+            ])
         
         # Generate
-        with torch.no_grad():
+        with torch.inference_mode():
             outputs = self.model.generate(
                 **inputs,
-                max_new_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                num_return_sequences=num_return_sequences,
-                do_sample=temperature > 0,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
+                max_new_tokens=max(max_tokens),
+                **self._sampling_kwargs(temperature, top_p, top_k, repetition_penalty),
+                **generate_kwargs,
             )
         
-        # Decode
-        generated_text = self.tokenizer.decode(
-            outputs[0],
-            skip_special_tokens=True
-        )
+        # Prompt kısmını at, her satırı kendi token limitine göre kes
+        new_tokens = outputs[:, inputs["input_ids"].shape[1]:]
         
-        # Promptu çıkar
-        code = self._extract_code(generated_text, formatted_prompt)
+        results = []
+        for row, length, limit in zip(new_tokens, self._generated_lengths(new_tokens), max_tokens):
+            n_tokens = min(length, limit)
+            code = self.tokenizer.decode(row[:n_tokens], skip_special_tokens=True).strip()
+            results.append((code, n_tokens) if return_token_counts else code)
         
-        return code
+        return results
+    
+    def _generated_lengths(self, new_tokens: torch.Tensor) -> List[int]:
+        """
+        Satır başına üretilen token sayısı (EOS ve sonrasındaki padding hariç)
+        
+        Erken biten satırlar EOS/padding ile dolar; uzunluk ilk EOS veya
+        pad token'ının konumu, yoksa tüm genişliktir. Continuous batcher da
+        EOS'u saymaz; aynı istek her yolda aynı sayıyı döndürür.
+        """
+        is_end = new_tokens == self.tokenizer.eos_token_id
+        if self.tokenizer.pad_token_id is not None:
+            is_end |= new_tokens == self.tokenizer.pad_token_id
+        
+        return torch.where(
+            is_end.any(dim=1),
+            is_end.int().argmax(dim=1),
+            new_tokens.shape[1]
+        ).tolist()
     
     def generate_project(
         self,
@@ -155,9 +659,64 @@ class CodeGenius:
         Returns:
             Dosya yolu: kod içeriği dictionary'si
         """
-        prompt = f"""
-Aşağıdaki özelliklere sahip tam bir proje oluştur:
-
+        prompt = self._project_prompt(description, tech_stack, features, architecture)
+        
+        # Büyük proje için daha fazla token
+        generated = self.generate(
+            prompt,
+            cache_prefix=self.PROMPT_PREFIXES["project"],
+            **self.TASK_PARAMS["project"]
+        )
+        
+        # Dosyaları parse et
+        files = self._parse_project_files(generated)
+        
+        return files
+    
+    def stream_project(
+        self,
+        description: str,
+        tech_stack: List[str],
+        features: List[str],
+        architecture: str = "modular"
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Proje üret, her dosyayı tamamlandığı anda döndür
+        
+        Args:
+            description: Proje açıklaması
+            tech_stack: Teknoloji stack'i
+            features: Özellikler listesi
+            architecture: Mimari tipi
+            
+        Returns:
+            (dosya yolu, kod içeriği) iterator'ı
+        """
+        prompt = self._project_prompt(description, tech_stack, features, architecture)
+        parser = ProjectFileStream()
+        
+        chunks = self.generate(
+            prompt,
+            stream=True,
+            cache_prefix=self.PROMPT_PREFIXES["project"],
+            **self.TASK_PARAMS["project"]
+        )
+        
+        try:
+            for chunk in chunks:
+                yield from parser.feed(chunk)
+        finally:
+            chunks.close()
+    
+    def _project_prompt(
+        self,
+        description: str,
+        tech_stack: List[str],
+        features: List[str],
+        architecture: str
+    ) -> str:
+        """Proje üretim promptunu oluştur (sabit talimatlar başta)"""
+        return self.PROMPT_PREFIXES["project"] + f"""
 Açıklama: {description}
 
 Teknolojiler: {', '.join(tech_stack)}
@@ -166,35 +725,15 @@ Teknolojiler: {', '.join(tech_stack)}
 {chr(10).join(f'- {feature}' for feature in features)}
 
 Mimari: {architecture}
-
-Lütfen şunları içeren tam bir proje yapısı oluştur:
-1. Tüm gerekli dosyaları
-2. Düzgün klasör organizasyonu
-3. Her dosya için tam kod
-4. README ve dokümantasyon
-5. Test dosyaları
-6. Konfigürasyon dosyaları
-
-Her dosyayı şu formatta ver:
-=== DOSYA: dosya/yolu/isim.ext ===
-[kod içeriği]
-=== DOSYA SONU ===
 """
-        
-        # Büyük proje için daha fazla token
-        generated = self.generate(prompt, max_tokens=8000, temperature=0.6)
-        
-        # Dosyaları parse et
-        files = self._parse_project_files(generated)
-        
-        return files
     
     def refactor(
         self,
         code: str,
         requirements: List[str],
-        language: Optional[str] = None
-    ) -> str:
+        language: Optional[str] = None,
+        stream: bool = False
+    ) -> Union[str, Iterator[str]]:
         """
         Kod iyileştirme
         
@@ -202,33 +741,46 @@ Her dosyayı şu formatta ver:
             code: İyileştirilecek kod
             requirements: İyileştirme gereksinimleri
             language: Programlama dili
+            stream: True ise metni üretildikçe parça parça döndür
             
         Returns:
             İyileştirilmiş kod
         """
-        lang_hint = f" ({language})" if language else ""
+        prompt = self._refactor_prompt(code, requirements, language)
+        
+        return self.generate(
+            prompt,
+            stream=stream,
+            cache_prefix=self.PROMPT_PREFIXES["refactor"],
+            **self.TASK_PARAMS["refactor"]
+        )
+    
+    def _refactor_prompt(
+        self,
+        code: str,
+        requirements: List[str],
+        language: Optional[str] = None
+    ) -> str:
+        """Kod iyileştirme promptunu oluştur (sabit talimatlar başta)"""
+        lang_hint = f"\nDil: {language}\n" if language else ""
         
-        prompt = f"""
-Aşağıdaki kodu{lang_hint} iyileştir:
+        return self.PROMPT_PREFIXES["refactor"] + f"""{lang_hint}
+İyileştirme gereksinimleri:
+{chr(10).join(f'- {req}' for req in requirements)}
 
+Kod:
 ```
 {code}
 ```
-
-İyileştirme gereksinimleri:
-{chr(10).join(f'- {req}' for req in requirements)}
-
-İyileştirilmiş, temiz ve profesyonel kod ver.
 """
-        
-        return self.generate(prompt, max_tokens=3000, temperature=0.5)
     
     def generate_tests(
         self,
         code: str,
         framework: str = "pytest",
-        coverage_target: int = 90
-    ) -> str:
+        coverage_target: int = 90,
+        stream: bool = False
+    ) -> Union[str, Iterator[str]]:
         """
         Test kodu üret
         
@@ -236,66 +788,271 @@ Aşağıdaki kodu{lang_hint} iyileştir:
             code: Test edilecek kod
             framework: Test framework'ü
             coverage_target: Hedef kapsama yüzdesi
+            stream: True ise metni üretildikçe parça parça döndür
             
         Returns:
             Test kodu
         """
-        prompt = f"""
-Aşağıdaki kod için {framework} testleri yaz:
+        prompt = self._tests_prompt(code, framework, coverage_target)
+        
+        return self.generate(
+            prompt,
+            stream=stream,
+            cache_prefix=self.PROMPT_PREFIXES["tests"],
+            **self.TASK_PARAMS["tests"]
+        )
+    
+    def _tests_prompt(
+        self,
+        code: str,
+        framework: str = "pytest",
+        coverage_target: int = 90
+    ) -> str:
+        """Test üretim promptunu oluştur (sabit talimatlar başta)"""
+        return self.PROMPT_PREFIXES["tests"] + f"""- %{coverage_target} kod kapsamı hedefle
+
+Framework: {framework}
 
+Kod:
 ```
 {code}
 ```
-
-Gereksinimler:
-- %{coverage_target} kod kapsamı hedefle
-- Edge case'leri test et
-- Mock'ları uygun şekilde kullan
-- Açıklayıcı test isimleri
-
-Tam test dosyası ver.
 """
+    
+    def _prepare_inputs(
+        self,
+        prompts: List[str],
+        cache_prefix: Optional[str] = None
+    ) -> Tuple[Dict[str, torch.Tensor], Optional[DynamicCache]]:
+        """
+        Promptları formatla ve tokenize et
+        
+        `cache_prefix` verilirse yalnızca prefix'ten sonraki kısım tokenize
+        edilir; prefix'in token'ları ve KV cache'i önbellekten gelir. Ortadaki
+        padding attention mask ile maskelenir. Prefix cache kapalıysa (bkz.
+        `_prefix_cache_enabled`) prompt tamamen tokenize edilir.
+        
+        Returns:
+            (model girdileri, prefix KV cache'inin kopyası veya None)
+        """
+        formatted_prompts = [self._format_prompt(prompt) for prompt in prompts]
+        
+        if cache_prefix is None or not self._prefix_cache_enabled():
+            inputs = self.tokenizer(
+                formatted_prompts,
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+                max_length=4096
+            )
+            return self._to_device(inputs), None
+        
+        if not all(prompt.startswith(cache_prefix) for prompt in prompts):
+            raise ValueError("cache_prefix her promptun başlangıcı olmalı")
+        
+        prefix_text = self._format_prefix(cache_prefix)
+        prefix_ids, prefix_kv = self._get_prefix_cache(prefix_text)
+        
+        suffixes = self.tokenizer(
+            [prompt[len(prefix_text):] for prompt in formatted_prompts],
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=4096 - prefix_ids.shape[1],
+            add_special_tokens=False
+        )
+        suffixes = self._to_device(suffixes)
+        
+        batch_size = len(prompts)
+        input_ids = torch.cat(
+            [prefix_ids.expand(batch_size, -1), suffixes["input_ids"]], dim=1
+        )
+        attention_mask = torch.cat(
+            [torch.ones_like(prefix_ids).expand(batch_size, -1), suffixes["attention_mask"]],
+            dim=1
+        )
+        
+        # Önbellekteki cache generate sırasında büyür; kopyası üzerinde çalış
+        past_key_values = copy.deepcopy(prefix_kv)
+        if batch_size > 1:
+            past_key_values.batch_repeat_interleave(batch_size)
+        
+        return {"input_ids": input_ids, "attention_mask": attention_mask}, past_key_values
+    
+    def _to_device(self, encoding) -> Dict[str, torch.Tensor]:
+        """
+        Tokenizer çıktısını modelin cihazına taşı
+        
+        CUDA'da tensörler pinned belleğe alınıp asenkron kopyalanır; kopya
+        aynı stream'deki forward'dan önce tamamlanır, CPU beklemez.
+        """
+        device = self.model.device
+        if device.type != "cuda":
+            return {key: value.to(device) for key, value in encoding.items()}
+        
+        return {
+            key: value.pin_memory().to(device, non_blocking=True)
+            for key, value in encoding.items()
+        }
+    
+    def _get_prefix_cache(self, prefix_text: str) -> Tuple[torch.Tensor, DynamicCache]:
+        """Prefix'in token'larını ve KV cache'ini önbellekten al veya hesapla"""
+        key = self._prefix_key(prefix_text)
+        
+        if key in self._prefix_cache:
+            self._prefix_cache.move_to_end(key)
+            return self._prefix_cache[key]
+        
+        prefix_ids = self._to_device(
+            self.tokenizer(prefix_text, return_tensors="pt")
+        )["input_ids"]
+        
+        # Prefix için tek seferlik prefill
+        with torch.inference_mode():
+            outputs = self.model(
+                prefix_ids,
+                past_key_values=DynamicCache(),
+                use_cache=True
+            )
+        
+        self._prefix_cache[key] = (prefix_ids, outputs.past_key_values)
+        if len(self._prefix_cache) > self.PREFIX_CACHE_SIZE:
+            self._prefix_cache.popitem(last=False)
+        
+        return self._prefix_cache[key]
+    
+    def build_prefix_cache(self, cache_prefix: str) -> Optional[Tuple[torch.Tensor, DynamicCache]]:
+        """
+        Prompt başlangıcının KV cache'ini hesapla veya önbellekten al
+        
+        `cache_prefix` ile başlayan promptlar `cache_prefix` argümanıyla
+        üretildiğinde bu cache kullanılır; yalnızca kalan kısım prefill
+        edilir. Önceden çağrılırsa ilk isteğin gecikmesi de düşer.
+        
+        Args:
+            cache_prefix: Promptların ortak başlangıcı
+            
+        Returns:
+            (prefix token'ları, KV cache); prefix cache kapalıysa None
+        """
+        if not self._prefix_cache_enabled():
+            return None
+        
+        return self._get_prefix_cache(self._format_prefix(cache_prefix))
+    
+    def _prefix_cache_enabled(self) -> bool:
+        """
+        Prefix KV cache kullanılabilir mi
+        
+        Prefix'in KV'si büyüyen bir DynamicCache'tir; derlenmiş modelin
+        StaticCache'inin (shape her değiştiğinde yeniden derleme) ve uzun
+        üretimlerin CPU offload'unun yerini alırdı. Bu modlarda promptlar
+        baştan prefill edilir.
+        """
+        return not (self.compile_model or self.offload_kv)
+    
+    def release_prefix(self, cache_prefix: str):
+        """Artık kullanılmayacak bir prefix'in KV cache'ini bellekten at"""
+        prefix_text = self._format_prefix(cache_prefix)
+        self._prefix_cache.pop(self._prefix_key(prefix_text), None)
+    
+    def _format_prefix(self, cache_prefix: str) -> str:
+        """Formatlanmış promptun `cache_prefix` ile biten başlangıcı"""
+        formatted = self._format_prompt(cache_prefix)
+        return formatted[:formatted.index(cache_prefix) + len(cache_prefix)]
+    
+    def _prefix_key(self, prefix_text: str) -> str:
+        """Prefix önbelleği anahtarı"""
+        return hashlib.sha1(prefix_text.encode("utf-8")).hexdigest()
+    
+    def _sampling_kwargs(
+        self,
+        temperature: float,
+        top_p: float,
+        top_k: int,
+        repetition_penalty: float = 1.0
+    ) -> Dict:
+        """
+        Sampling ayarları
+        
+        Temperature ≈ 0 ise greedy: her adımdaki softmax, top-p sıralaması
+        ve multinomial örnekleme yapılmaz. İşlemciler hazır listeden gelir;
+        generate'in kendi kopyalarını kurmaması için config değerleri nötrdür.
+        """
+        if temperature <= self.GREEDY_TEMPERATURE:
+            return {
+                "do_sample": False,
+                "temperature": 1.0,
+                "top_p": 1.0,
+                "logits_processor": _logits_processors(None, 1.0, 0, repetition_penalty),
+            }
+        
+        return {
+            "do_sample": True,
+            "temperature": 1.0,
+            "top_p": 1.0,
+            "top_k": 0,
+            "logits_processor": _logits_processors(temperature, top_p, top_k, repetition_penalty),
+        }
+    
+    def _cache_kwargs(self, batch_size: int, total_len: int) -> Dict:
+        """Üretim için KV cache ayarlarını döndür"""
+        # Uzun bağlamda boştaki katmanların KV'si pinned CPU belleğinde
+        # tutulur, bir sonraki katmanınki hesaplama sırasında GPU'ya alınır
+        if self.offload_kv and total_len > self.OFFLOAD_THRESHOLD:
+            return {"cache_implementation": "offloaded"}
+        
+        if not self.compile_model:
+            return {}
+        
+        return {"past_key_values": self._static_cache(batch_size, total_len)}
+    
+    def _static_cache(self, batch_size: int, total_len: int) -> StaticCache:
+        """
+        Önceden ayrılmış KV cache oluştur
+        
+        Uzunluk 2'nin kuvvetine yuvarlanır (min 512); böylece farklı
+        prompt uzunlukları aynı derlenmiş graph'ı yeniden kullanır.
+        """
+        max_cache_len = max(512, 1 << (total_len - 1).bit_length())
+        
+        return StaticCache(
+            config=self.model.config,
+            max_batch_size=batch_size,
+            max_cache_len=max_cache_len,
+            device=self.model.device,
+            dtype=self.model.dtype
+        )
+    
+    def _warmup_compile(self, max_cache_len: int = 4096):
+        """İlk istekte derleme gecikmesi olmaması için compile'ı ısıt"""
+        inputs = self.tokenizer(
+            self._format_prompt("print('hello')"),
+            return_tensors="pt"
+        ).to(self.model.device)
         
-        return self.generate(prompt, max_tokens=2000, temperature=0.4)
+        with torch.inference_mode():
+            self.model.generate(
+                **inputs,
+                max_new_tokens=2,
+                do_sample=False,
+                past_key_values=self._static_cache(1, max_cache_len),
+            )
     
     def _format_prompt(self, prompt: str) -> str:
         """DeepSeek için prompt formatla"""
         # DeepSeek Coder instruction format
         return f"### Instruction:\n{prompt}\n\n### Response:\n"
     
-    def _extract_code(self, generated_text: str, prompt: str) -> str:
-        """Üretilen metinden kodu çıkar"""
-        # Promptu kaldır
-        if prompt in generated_text:
-            code = generated_text.split(prompt)[-1]
-        else:
-            code = generated_text
-        
-        return code.strip()
-    
     def _parse_project_files(self, generated_text: str) -> Dict[str, str]:
         """Üretilen projeden dosyaları parse et"""
         files = {}
-        current_file = None
-        current_content = []
-        
-        for line in generated_text.split('\n'):
-            if line.startswith('=== DOSYA:'):
-                # Önceki dosyayı kaydet
-                if current_file:
-                    files[current_file] = '\n'.join(current_content)
-                
-                # Yeni dosya başlat
-                current_file = line.replace('=== DOSYA:', '').replace('===', '').strip()
-                current_content = []
-            elif line.startswith('=== DOSYA SONU ==='):
-                # Dosyayı kaydet
-                if current_file:
-                    files[current_file] = '\n'.join(current_content)
-                current_file = None
-                current_content = []
-            elif current_file:
-                current_content.append(line)
+        
+        # Satır satır gezmek yerine tek regex taraması
+        for match in _FILE_RE.finditer(generated_text):
+            file_path = match.group(1).replace('===', '').strip()
+            if file_path:
+                files[file_path] = match.group(2)
         
         return files
 
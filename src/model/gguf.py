@@ -0,0 +1,162 @@
+"""
+GGUF Model Wrapper - llama.cpp backend'i
+16b/33b modelleri tüketici GPU'larında (veya CPU'da) çalıştırmak için
+"""
+
+from typing import Optional, List, Iterator, Tuple, Union
+import logging
+
+from .deepseek import CodeGenius
+
+logger = logging.getLogger(__name__)
+
+
+class LlamaAdapter(CodeGenius):
+    """
+    llama.cpp ile çalışan, CodeGenius ile aynı arayüze sahip model
+    
+    k-quant (q4_K_M, q5_K_M) ağırlıkları llama.cpp'nin kendi CPU/CUDA
+    kernelleriyle doğrudan çarpılır; bitsandbytes'taki fp16'ya dequant
+    adımı olmadığından decode hızı belirgin şekilde yüksektir. Prompt
+    oluşturma ve parse işlemleri CodeGenius'tan gelir.
+    """
+    
+    # (model boyutu, quant tipi) -> (HF repo, GGUF dosyası)
+    GGUF_VARIANTS = {
+        ("1.3b", "q4_K_M"): ("TheBloke/deepseek-coder-1.3b-instruct-GGUF", "deepseek-coder-1.3b-instruct.Q4_K_M.gguf"),
+        ("1.3b", "q5_K_M"): ("TheBloke/deepseek-coder-1.3b-instruct-GGUF", "deepseek-coder-1.3b-instruct.Q5_K_M.gguf"),
+        ("6.7b", "q4_K_M"): ("TheBloke/deepseek-coder-6.7B-instruct-GGUF", "deepseek-coder-6.7b-instruct.Q4_K_M.gguf"),
+        ("6.7b", "q5_K_M"): ("TheBloke/deepseek-coder-6.7B-instruct-GGUF", "deepseek-coder-6.7b-instruct.Q5_K_M.gguf"),
+        ("33b", "q4_K_M"): ("TheBloke/deepseek-coder-33B-instruct-GGUF", "deepseek-coder-33b-instruct.Q4_K_M.gguf"),
+        ("33b", "q5_K_M"): ("TheBloke/deepseek-coder-33B-instruct-GGUF", "deepseek-coder-33b-instruct.Q5_K_M.gguf"),
+    }
+    
+    def __init__(self,
+        model_size: str = "6.7b",
+        quant_type: str = "q4_K_M",
+        model_path: Optional[str] = None,
+        n_gpu_layers: int = -1,
+        n_ctx: int = 8192
+    ):
+        """
+        Args:
+            model_size: Model boyutu (1.3b, 6.7b, 33b)
+            quant_type: GGUF quant tipi (q4_K_M, q5_K_M)
+            model_path: Yerel .gguf dosyası (verilirse indirme yapılmaz)
+            n_gpu_layers: GPU'ya alınacak katman sayısı (-1: hepsi)
+            n_ctx: Bağlam uzunluğu (prompt + üretim)
+        """
+        try:
+            from llama_cpp import Llama
+        except ImportError:
+            raise ImportError("GGUF için llama-cpp-python gerekli: pip install llama-cpp-python")
+        
+        self.model_size = model_size
+        self.device = "auto"
+        self.quantization = f"gguf-{quant_type}"
+        self.compile_model = False
+        self.offload_kv = False
+        self.draft_model = None
+        
+        if model_path:
+            logger.info(f"GGUF model yükleniyor: {model_path}")
+            self.llm = Llama(model_path=model_path, n_gpu_layers=n_gpu_layers, n_ctx=n_ctx, verbose=False)
+        else:
+            variant = self.GGUF_VARIANTS.get((model_size, quant_type))
+            if not variant:
+                raise ValueError(f"GGUF checkpoint'i bulunamadı: {model_size} / {quant_type}")
+            
+            repo_id, filename = variant
+            logger.info(f"GGUF model yükleniyor: {repo_id}/{filename}")
+            self.llm = Llama.from_pretrained(
+                repo_id=repo_id,
+                filename=filename,
+                n_gpu_layers=n_gpu_layers,
+                n_ctx=n_ctx,
+                verbose=False
+            )
+        
+        logger.info("Model başarıyla yüklendi!")
+    
+    def generate(
+        self,
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        top_k: int = 50,
+        repetition_penalty: float = 1.0,
+        num_return_sequences: int = 1,
+        stop_sequences: Optional[List[str]] = None,
+        cache_prefix: Optional[str] = None,
+        stream: bool = False,
+        return_token_count: bool = False
+    ) -> Union[str, Tuple[str, int], Iterator[str]]:
+        """
+        Kod üretimi (CodeGenius.generate ile aynı parametreler)
+        
+        `cache_prefix` yok sayılır: llama.cpp bir önceki promptla ortak
+        başlangıcın KV'sini kendiliğinden yeniden kullanır.
+        
+        Returns:
+            Üretilen kod (stream=True ise metin parçaları iterator'ı)
+        """
+        # Temperature ≈ 0: llama.cpp'de de greedy örnekleme
+        if temperature <= self.GREEDY_TEMPERATURE:
+            temperature, top_k = 0.0, 1
+        
+        completion = self.llm.create_completion(
+            self._format_prompt(prompt),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            repeat_penalty=repetition_penalty,
+            stop=stop_sequences,
+            stream=stream
+        )
+        
+        if stream:
+            return (chunk["choices"][0]["text"] for chunk in completion)
+        
+        code = completion["choices"][0]["text"].strip()
+        
+        if return_token_count:
+            return code, completion["usage"]["completion_tokens"]
+        
+        return code
+    
+    def generate_batch(
+        self,
+        prompts: List[str],
+        max_tokens: Union[int, List[int]] = 2048,
+        temperature: float = 0.7,
+        top_p: float = 0.95,
+        top_k: int = 50,
+        repetition_penalty: float = 1.0,
+        cache_prefix: Optional[str] = None,
+        return_token_counts: bool = False
+    ) -> Union[List[str], List[Tuple[str, int]]]:
+        """Promptları sırayla üret (llama.cpp tek dizi decode eder)"""
+        if isinstance(max_tokens, int):
+            max_tokens = [max_tokens] * len(prompts)
+        
+        return [
+            self.generate(
+                prompt,
+                max_tokens=limit,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+                repetition_penalty=repetition_penalty,
+                return_token_count=return_token_counts
+            )
+            for prompt, limit in zip(prompts, max_tokens)
+        ]
+    
+    def build_prefix_cache(self, cache_prefix: str):
+        """llama.cpp prefix KV'sini kendisi yönetir; yapılacak bir şey yok"""
+        return None
+    
+    def release_prefix(self, cache_prefix: str):
+        """llama.cpp prefix KV'sini kendisi yönetir; yapılacak bir şey yok"""
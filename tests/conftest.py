@@ -0,0 +1,47 @@
+"""
+Ortak test fixture'ları
+"""
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def tiny_model_path(tmp_path_factory):
+    """Rastgele ağırlıklı küçük Llama + kelime tokenizer'ı (CodeGenius ile yüklenebilir)"""
+    torch = pytest.importorskip("torch")
+    transformers = pytest.importorskip("transformers")
+    tokenizers = pytest.importorskip("tokenizers")
+    
+    vocab = {"<unk>": 0, "<eos>": 1, "<bos>": 2}
+    for word in "### Instruction: Response: def print x y = ( ) a b c 1 2 3".split():
+        vocab.setdefault(word, len(vocab))
+    for index in range(60):
+        vocab.setdefault(f"w{index}", len(vocab))
+    
+    tokenizer = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = tokenizers.pre_tokenizers.WhitespaceSplit()
+    tokenizer = transformers.PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        model_input_names=["input_ids", "attention_mask"],
+        eos_token="<eos>",
+        bos_token="<bos>",
+        unk_token="<unk>"
+    )
+    
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=len(vocab),
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=8192,
+        eos_token_id=1,
+        bos_token_id=2
+    )
+    
+    path = tmp_path_factory.mktemp("tiny")
+    tokenizer.save_pretrained(path)
+    transformers.LlamaForCausalLM(config).save_pretrained(path)
+    return str(path)
@@ -0,0 +1,126 @@
+"""
+AdvancedCodeGenius testleri - model yüklenmeden
+"""
+
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.model.advanced_genius import AdvancedCodeGenius  # noqa: E402
+
+
+@pytest.fixture
+def genius():
+    genius = AdvancedCodeGenius.__new__(AdvancedCodeGenius)
+    genius.model = genius.tokenizer = None
+    genius._project_generator = None
+    return genius
+
+
+def test_structured_project_falls_back_on_incompatible_outlines(genius, monkeypatch):
+    """outlines 1.x (generate/samplers yok) adım adım üretime dönüşü bozmaz"""
+    monkeypatch.setitem(sys.modules, "outlines", types.ModuleType("outlines"))
+    
+    assert genius._generate_structured_project("Todo API", "modular") is None
+
+
+def test_structured_project_falls_back_on_malformed_output(genius, monkeypatch):
+    monkeypatch.setitem(sys.modules, "outlines", types.ModuleType("outlines"))
+    genius._project_generator = lambda prompt, max_tokens: {"plan": "yarım"}
+    
+    assert genius._generate_structured_project("Todo API", "modular") is None
+
+
+def test_structured_project(genius, monkeypatch):
+    monkeypatch.setitem(sys.modules, "outlines", types.ModuleType("outlines"))
+    genius._project_generator = lambda prompt, max_tokens: {
+        "plan": "plan",
+        "files": [
+            {"path": "main.py", "description": "giriş", "code": "```python\nimport os\n```"},
+            {"path": " ", "description": "", "code": ""}
+        ]
+    }
+    
+    plan, generated = genius._generate_structured_project("Todo API", "modular")
+    
+    assert plan["plan_text"] == "plan"
+    assert generated == [("main.py", {"description": "giriş"}, "import os")]
+
+
+_GOOD = '''"""Kullanıcı servisi"""
+
+import json
+
+
+def load(path: str) -> dict:
+    """Kullanıcıyı dosyadan oku"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+'''
+
+
+def test_quality_checks_python(genius):
+    assert genius._quality_checks(_GOOD, "app/users.py") == {
+        'reasonable_length': True,
+        'no_placeholder': True,
+        'valid_syntax': True,
+        'has_docstrings': True,
+        'has_type_hints': True,
+        'has_error_handling': True,
+    }
+    assert genius._check_quality(_GOOD, "app/users.py")
+
+
+def test_quality_checks_use_syntax_not_substrings(genius):
+    """Metin içindeki '->', 'try:' veya üçlü tırnak kontrolleri geçirmez"""
+    code = 'MESSAGE = "a -> b; try: x"\nNOTE = \'\'\'\'\'\'\n' + "x = 1\n" * 40
+    
+    checks = genius._quality_checks(code, "notes.py")
+    
+    assert checks['valid_syntax']
+    assert not checks['has_docstrings']
+    assert not checks['has_type_hints']
+    assert not checks['has_error_handling']
+    assert not genius._check_quality(code, "notes.py")
+
+
+def test_quality_checks_syntax_error(genius):
+    code = _GOOD + "\ndef broken(:\n"
+    
+    checks = genius._quality_checks(code, "app/users.py")
+    
+    assert checks['valid_syntax'] is False
+    assert 'has_docstrings' not in checks
+    assert not genius._check_quality(code, "app/users.py")
+
+
+def test_quality_checks_non_python(genius):
+    """Python dışı dosyalar parse edilmez; yalnızca metin kontrolleri"""
+    assert genius._quality_checks("// TODO\n" + "const x = 1;\n" * 20, "app.js") == {
+        'reasonable_length': True,
+        'no_placeholder': False,
+    }
+
+
+def test_quality_checks_annotated_assignment_and_async(genius):
+    code = (
+        '"""Modül"""\n'
+        "import asyncio\n\n"
+        "RETRIES: int = 3\n\n\n"
+        "async def run():\n"
+        "    try:\n"
+        "        await asyncio.sleep(0)\n"
+        "    except asyncio.CancelledError:\n"
+        "        raise\n"
+    )
+    
+    checks = genius._quality_checks(code, "run.py")
+    
+    assert checks['has_type_hints'] and checks['has_error_handling'] and checks['has_docstrings']
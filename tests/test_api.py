@@ -0,0 +1,152 @@
+"""
+API akış testleri - sahte model ve batcher ile
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("fastapi")
+httpx = pytest.importorskip("httpx")
+
+from src.inference import api  # noqa: E402
+from src.inference.batch import ContinuousBatcher  # noqa: E402
+
+
+class _Batcher(ContinuousBatcher):
+    """Sabit parçalar akıtan, kapatıldığını kaydeden sahte batcher"""
+    
+    def __init__(self, chunks):
+        super().__init__(genius=None)
+        self.chunks = chunks
+        self.requests = []
+        self.closed = False
+    
+    async def stream(self, prompt, **params):
+        self.requests.append((prompt, params))
+        try:
+            for chunk in self.chunks:
+                yield chunk
+        finally:
+            self.closed = True
+
+
+class _Genius:
+    PROMPT_PREFIXES = {"project": "PROJE"}
+    TASK_PARAMS = {"project": {"max_tokens": 100, "temperature": 0.6}}
+    
+    def __init__(self, chunks=()):
+        self.chunks = chunks
+        self.active = 0
+        self.max_active = 0
+        self.closed = 0
+        self.threads = set()
+        self._lock = threading.Lock()
+    
+    def _project_prompt(self, description, tech_stack, features, architecture):
+        return f"PROJE {description}"
+    
+    def generate(self, prompt, max_tokens, temperature, stream):
+        self.threads.add(threading.get_ident())
+        return self._stream()
+    
+    def _stream(self):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            for chunk in self.chunks:
+                time.sleep(0.01)
+                yield chunk
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.closed += 1
+
+
+def _post(path, payload):
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=payload)
+    
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def install(genius, batcher):
+        monkeypatch.setattr(api, "genius", genius)
+        monkeypatch.setattr(api, "batcher", batcher)
+    
+    return install
+
+
+def test_generate_stream_uses_continuous_batcher(server):
+    batcher = _Batcher(["def ", "f():", "\n    pass"])
+    server(_Genius(), batcher)
+    
+    response = _post("/generate", {"prompt": "f yaz", "max_tokens": 10, "temperature": 0, "stream": True})
+    
+    assert response.text.count("data: ") == 4
+    assert response.text.endswith("data: [DONE]\n\n")
+    assert batcher.requests == [("f yaz", {"max_tokens": 10, "temperature": 0})]
+    assert batcher.closed
+
+
+def test_project_stream_parses_batched_files(server):
+    batcher = _Batcher(["=== DOSYA: a.py ===\nx = 1\n=== DOSYA", ": b.py ===\ny\n=== DOSYA SONU ===\n"])
+    server(_Genius(), batcher)
+    
+    response = _post("/project", {"description": "d", "tech_stack": [], "features": [], "stream": True})
+    
+    assert [line for line in response.text.splitlines() if line] == [
+        '{"path": "a.py", "content": "x = 1"}',
+        '{"path": "b.py", "content": "y"}',
+    ]
+    assert batcher.requests[0][1]["cache_prefix"] == "PROJE"
+
+
+def test_micro_streams_are_limited_and_threaded(server, monkeypatch):
+    genius = _Genius(["a", "b", "c"])
+    server(genius, None)
+    monkeypatch.setattr(api, "_stream_slots", asyncio.Semaphore(1))
+    
+    async def run():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post("/generate", json={"prompt": "p", "stream": True}) for _ in range(3)
+            ))
+    
+    responses = asyncio.run(run())
+    
+    assert all(response.text.count("data: ") == 4 for response in responses)
+    assert genius.max_active == 1
+    assert threading.get_ident() not in genius.threads
+
+
+def test_disconnect_closes_stream():
+    """İstemci ayrılınca kaynak iterator kapatılır (generate durur)"""
+    genius = _Genius(["a"] * 100)
+    
+    class _Request:
+        async def is_disconnected(self):
+            return genius.active and len(received) >= 2
+    
+    received = []
+    
+    async def run():
+        async for chunk in api._until_disconnected(_Request(), api._threaded_stream(lambda: genius.generate(
+            "p", max_tokens=100, temperature=0, stream=True
+        ))):
+            received.append(chunk)
+    
+    asyncio.run(run())
+    
+    assert len(received) == 2
+    assert genius.closed == 1 and genius.active == 0
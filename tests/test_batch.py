@@ -0,0 +1,198 @@
+"""
+ContinuousBatcher testleri - küçük rastgele Llama modeliyle
+"""
+
+import asyncio
+import random
+
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from src.inference.batch import ContinuousBatcher  # noqa: E402
+
+EOS = 1
+
+
+class _Tokenizer:
+    """Her token'ı tek karaktere çeviren tokenizer (parça parça decode güvenli)"""
+    
+    def __init__(self):
+        self.eos_token_id = EOS
+    
+    def decode(self, tokens, skip_special_tokens=True):
+        return "".join(chr(60 + token) for token in tokens if token != EOS)
+
+
+class _Genius:
+    """Promptu boşlukla ayrılmış token id'leri olarak okuyan sahte CodeGenius"""
+    
+    GREEDY_TEMPERATURE = 0.05
+    
+    def __init__(self, model):
+        self.model = model
+        self.tokenizer = _Tokenizer()
+    
+    def _prepare_inputs(self, prompts, cache_prefix=None):
+        input_ids = torch.tensor([[int(token) for token in prompts[0].split()]])
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}, None
+
+
+@pytest.fixture(scope="module")
+def genius():
+    torch.manual_seed(0)
+    config = transformers.LlamaConfig(
+        vocab_size=50,
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=256
+    )
+    return _Genius(transformers.LlamaForCausalLM(config).eval())
+
+
+def _greedy(genius, prompt, max_tokens):
+    """Tek dizi, KV cache'siz referans greedy decode"""
+    input_ids = torch.tensor([[int(token) for token in prompt.split()]])
+    tokens = []
+    
+    with torch.no_grad():
+        for _ in range(max_tokens):
+            token = int(genius.model(input_ids).logits[0, -1].argmax())
+            if token == EOS:
+                break
+            tokens.append(token)
+            input_ids = torch.cat([input_ids, torch.tensor([[token]])], dim=1)
+    
+    return genius.tokenizer.decode(tokens), len(tokens)
+
+
+def _prompts(count):
+    rng = random.Random(1)
+    return [
+        (" ".join(str(rng.randint(2, 49)) for _ in range(rng.randint(3, 40))), rng.randint(1, 30))
+        for _ in range(count)
+    ]
+
+
+def test_greedy_matches_sequential_decode(genius):
+    """Farklı uzunluktaki promptlar batch'te tek tek decode ile aynı sonucu verir"""
+    prompts = _prompts(12)
+    
+    async def run():
+        batcher = ContinuousBatcher(genius, max_batch=4)
+        try:
+            return await asyncio.gather(*(
+                batcher.submit(prompt, max_tokens=limit, temperature=0)
+                for prompt, limit in prompts
+            ))
+        finally:
+            await batcher.stop()
+    
+    results = asyncio.run(run())
+    
+    for (prompt, limit), (code, count) in zip(prompts, results):
+        expected, expected_count = _greedy(genius, prompt, limit)
+        assert (code, count) == (expected, expected_count)
+
+
+def test_stream_matches_submit(genius):
+    """Akışla gelen parçalar birleşince tam sonucu verir"""
+    prompt, limit = _prompts(1)[0]
+    
+    async def run():
+        batcher = ContinuousBatcher(genius)
+        try:
+            chunks = [chunk async for chunk in batcher.stream(prompt, max_tokens=limit, temperature=0)]
+            code, _ = await batcher.submit(prompt, max_tokens=limit, temperature=0)
+            return "".join(chunks), code
+        finally:
+            await batcher.stop()
+    
+    streamed, code = asyncio.run(run())
+    
+    assert streamed.strip() == code
+
+
+def test_stop_fails_active_sequences(genius):
+    """stop() yarıda kalan istekleri hata ile bitirir, beklemede bırakmaz"""
+    # EOS hiç üretilmez; dizi stop() gelene kadar çalışır
+    endless = _Genius(genius.model)
+    endless.tokenizer.eos_token_id = -1
+    
+    async def consume(stream):
+        async for _ in stream:
+            pass
+    
+    async def run():
+        batcher = ContinuousBatcher(endless)
+        stream = batcher.stream("5 6 7", max_tokens=10 ** 6, temperature=0)
+        await stream.__anext__()
+        await batcher.stop()
+        
+        with pytest.raises(RuntimeError, match="durduruldu"):
+            await asyncio.wait_for(consume(stream), timeout=10)
+    
+    asyncio.run(run())
+
+
+def test_merge_error_fails_batch_and_recovers(genius):
+    """KV birleştirmede hata (ör. OOM) batch'i düşürür, sonraki istekler çalışır"""
+    endless = _Genius(genius.model)
+    endless.tokenizer.eos_token_id = -1
+    
+    async def run():
+        batcher = ContinuousBatcher(endless, max_batch=4)
+        merge = batcher._merge
+        calls = []
+        
+        def failing_merge(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise torch.cuda.OutOfMemoryError("merge")
+            return merge(*args)
+        
+        batcher._merge = failing_merge
+        try:
+            results = await asyncio.wait_for(asyncio.gather(
+                batcher.submit("5 6 7", max_tokens=50, temperature=0),
+                batcher.submit("8 9", max_tokens=50, temperature=0),
+                return_exceptions=True
+            ), timeout=10)
+            after = await asyncio.wait_for(batcher.submit("5 6 7", max_tokens=5, temperature=0), timeout=10)
+        finally:
+            await batcher.stop()
+        
+        return results, after
+    
+    results, (_, count) = asyncio.run(run())
+    
+    assert all(isinstance(result, torch.cuda.OutOfMemoryError) for result in results)
+    assert count == 5
+
+
+def test_thread_restarts_after_crash(genius):
+    """Decode thread'i beklenmedik şekilde çökerse istekler hata alır, sonraki istek thread'i yeniden açar"""
+    
+    async def run():
+        batcher = ContinuousBatcher(genius)
+        schedule = batcher._schedule
+        
+        def crash(active):
+            batcher._schedule = schedule
+            raise RuntimeError("çöktü")
+        
+        batcher._schedule = crash
+        try:
+            with pytest.raises(RuntimeError, match="çöktü"):
+                await asyncio.wait_for(batcher.submit("5 6 7", max_tokens=3, temperature=0), timeout=10)
+            while batcher._thread is not None:
+                await asyncio.sleep(0.01)
+            return await asyncio.wait_for(batcher.submit("5 6 7", max_tokens=3, temperature=0), timeout=10)
+        finally:
+            await batcher.stop()
+    
+    assert asyncio.run(run()) == _greedy(genius, "5 6 7", 3)
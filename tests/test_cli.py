@@ -0,0 +1,72 @@
+"""
+CLI testleri - sahte modelle
+"""
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("click")
+
+from click.testing import CliRunner  # noqa: E402
+
+from cli import generate  # noqa: E402
+from src.model.deepseek import safe_project_path  # noqa: E402
+
+
+class _Genius:
+    """Sabit dosya listesi üreten sahte model"""
+    
+    def __init__(self, files):
+        self.files = files
+    
+    def stream_project(self, description, tech_stack, features):
+        yield from self.files
+
+
+@pytest.mark.parametrize("filepath, expected", [
+    ("main.py", "main.py"),
+    ("src/./app/models.py", "src/app/models.py"),
+    ("src\\utils.py", "src/utils.py"),
+    ("/etc/passwd", None),
+    ("../outside.py", None),
+    ("src/../../outside.py", None),
+    ("..\\outside.py", None),
+    ("C:\\windows\\x.py", None),
+    (".", None),
+])
+def test_safe_project_path(filepath, expected):
+    assert safe_project_path(filepath) == expected
+
+
+def _run_project(monkeypatch, tmp_path, files):
+    monkeypatch.setattr(generate, "load_genius", lambda model_size, quantization: _Genius(files))
+    output = tmp_path / "proje"
+    
+    result = CliRunner().invoke(generate.cli, [
+        "project", "-d", "Todo API", "-t", "FastAPI", "-f", "CRUD", "-o", str(output)
+    ])
+    
+    assert result.exit_code == 0, result.output
+    return output, result.output
+
+
+def test_project_skips_unsafe_paths(monkeypatch, tmp_path):
+    output, log = _run_project(monkeypatch, tmp_path, [
+        ("main.py", "print(1)"),
+        ("../kacak.py", "x"),
+        (str(tmp_path / "mutlak.py"), "x"),
+    ])
+    
+    assert sorted(p.name for p in tmp_path.rglob("*.py")) == ["main.py"]
+    assert (output / "main.py").read_text(encoding="utf-8") == "print(1)"
+    assert "Toplam 1 dosya" in log
+
+
+def test_project_keeps_last_duplicate(monkeypatch, tmp_path):
+    files = [("app/main.py", f"v{i}") for i in range(50)] + [("app/./main.py", "son")]
+    
+    output, log = _run_project(monkeypatch, tmp_path, files)
+    
+    assert (output / "app" / "main.py").read_text(encoding="utf-8") == "son"
+    assert "Toplam 1 dosya" in log
@@ -0,0 +1,111 @@
+"""
+Daemon istek/yanıt protokolü testleri - sahte modelle
+"""
+
+import json
+import os
+import socket
+import stat
+import threading
+
+import pytest
+
+from src.inference.daemon import DaemonClient, DaemonServer, connect
+
+
+class _Genius:
+    model_size = "6.7b"
+    quantization = "4bit"
+    
+    def generate(self, prompt, max_tokens=2048, stream=False):
+        if stream:
+            return (word + " " for word in prompt.split())
+        return prompt.upper()
+    
+    def stream_project(self, description):
+        yield "main.py", f"# {description}"
+        yield "README.md", "# Proje"
+    
+    def refactor(self, code):
+        raise ValueError("refactor başarısız")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "daemon.sock")
+
+
+@pytest.fixture
+def server(socket_path):
+    server = DaemonServer(_Genius(), socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_call_and_stream(server, socket_path):
+    client = DaemonClient(socket_path)
+    
+    assert client.generate("def f", max_tokens=5) == "DEF F"
+    assert list(client.generate("def f", stream=True)) == ["def ", "f "]
+    assert list(client.stream_project("Todo")) == [("main.py", "# Todo"), ("README.md", "# Proje")]
+
+
+def test_errors_are_raised_on_client(server, socket_path):
+    client = DaemonClient(socket_path)
+    
+    with pytest.raises(RuntimeError, match="refactor başarısız"):
+        client.refactor("x = 1")
+    with pytest.raises(RuntimeError, match="Bilinmeyen metot"):
+        client.call("__init__")
+
+
+def test_invalid_request_line(server, socket_path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        stream = sock.makefile("rwb")
+        stream.write(b"{bozuk\n")
+        stream.flush()
+        
+        assert json.loads(stream.readline())["error"].startswith("Geçersiz istek")
+
+
+def test_connect_matches_model_settings(server, socket_path):
+    assert connect("6.7b", "4bit", socket_path) is not None
+    assert connect("1.3b", "4bit", socket_path) is None
+    assert connect("6.7b", None, socket_path) is None
+
+
+def test_socket_is_private_and_not_taken_over(server, socket_path):
+    assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+    
+    with pytest.raises(RuntimeError, match="zaten çalışıyor"):
+        DaemonServer(_Genius(), socket_path)
+
+
+def test_stale_socket_is_replaced(socket_path):
+    # Kapanmış bir daemon'dan kalan, dinlenmeyen socket dosyası
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    
+    assert connect("6.7b", "4bit", socket_path) is None
+    
+    server = DaemonServer(_Genius(), socket_path)
+    server.server_close()
+    assert not os.path.exists(socket_path)
+
+
+def test_shutdown(socket_path):
+    server = DaemonServer(_Genius(), socket_path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    
+    assert DaemonClient(socket_path).call("shutdown") is True
+    thread.join(timeout=5)
+    server.server_close()
+    
+    assert not thread.is_alive()
@@ -0,0 +1,48 @@
+"""
+CodeGenius testleri - küçük rastgele modelle (CPU)
+"""
+
+import threading
+import time
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.model.deepseek import CodeGenius  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def genius(tiny_model_path):
+    return CodeGenius(custom_model_path=tiny_model_path, quantization=None, device="cpu")
+
+
+def test_closing_stream_stops_generation(genius):
+    """Akış kapatılınca (istemci ayrıldı) generate thread'i max_tokens'ı beklemeden biter"""
+    threads = threading.active_count()
+    chunks = genius.generate("def f", max_tokens=100000, temperature=0, stream=True)
+    
+    next(chunks)
+    chunks.close()
+    
+    deadline = time.time() + 10
+    while threading.active_count() > threads and time.time() < deadline:
+        time.sleep(0.01)
+    
+    assert threading.active_count() == threads
+
+
+def test_token_count_excludes_eos(genius, monkeypatch):
+    """generate ve generate_batch EOS'u saymaz (continuous batcher ile aynı)"""
+    eos = genius.tokenizer.eos_token_id
+    
+    def generate(input_ids, **kwargs):
+        return torch.cat([input_ids, torch.tensor([[5, 6, eos]]).expand(input_ids.shape[0], -1)], dim=1)
+    
+    monkeypatch.setattr(genius.model, "generate", generate)
+    
+    _, count = genius.generate("def f", max_tokens=10, temperature=0, return_token_count=True)
+    [(_, batch_count)] = genius.generate_batch(["def f"], max_tokens=10, temperature=0, return_token_counts=True)
+    
+    assert count == batch_count == 2
@@ -0,0 +1,93 @@
+"""
+MicroBatcher testleri - generate_batch çağrılarını kaydeden sahte modelle
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from src.inference.batch import MicroBatcher  # noqa: E402
+
+
+class _Genius:
+    def __init__(self):
+        self.calls = []
+    
+    def generate_batch(self, prompts, max_tokens, temperature, return_token_counts):
+        self.calls.append((list(prompts), list(max_tokens), temperature))
+        return [(f"{prompt}@{temperature}", limit) for prompt, limit in zip(prompts, max_tokens)]
+
+
+def _run(requests, **batcher_args):
+    """İstekleri aynı anda gönder; (sonuçlar, generate_batch çağrıları)"""
+    genius = _Genius()
+    
+    async def run():
+        batcher = MicroBatcher(genius, **batcher_args)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(
+                batcher.submit(prompt, max_tokens=max_tokens, temperature=temperature)
+                for prompt, max_tokens, temperature in requests
+            ))
+        finally:
+            await batcher.stop()
+    
+    return asyncio.run(run()), genius.calls
+
+
+def test_results_follow_requests():
+    requests = [("a", 10, 0.2), ("b", 20, 0.7), ("c", 30, 0.2)]
+    
+    results, _ = _run(requests)
+    
+    assert results == [("a@0.2", 10), ("b@0.7", 20), ("c@0.2", 30)]
+
+
+def test_groups_by_temperature():
+    """generate_batch tek temperature alır; farklı değerler ayrı çağrıda işlenir"""
+    requests = [("a", 10, 0.2), ("b", 20, 0.7), ("c", 30, 0.2)]
+    
+    _, calls = _run(requests)
+    
+    assert sorted(calls) == [(["a", "c"], [10, 30], 0.2), (["b"], [20], 0.7)]
+
+
+def test_buckets_by_prompt_length():
+    """Kısa promptlar uzun bir promptun padding'i ile aynı batch'e girmez"""
+    short = [(f"kısa {index}", 10, 0.5) for index in range(3)]
+    long = [("uzun " * 200, 10, 0.5)]
+    
+    _, calls = _run(short + long)
+    
+    assert sorted(len(prompts) for prompts, _, _ in calls) == [1, 3]
+    assert all(len({len(prompt).bit_length() for prompt in prompts}) == 1 for prompts, _, _ in calls)
+
+
+def test_max_batch_splits_bucket():
+    requests = [(f"p{index}", 10, 0.5) for index in range(5)]
+    
+    results, calls = _run(requests, max_batch=2)
+    
+    assert [len(prompts) for prompts, _, _ in calls] == [2, 2, 1]
+    assert [code for code, _ in results] == [f"p{index}@0.5" for index in range(5)]
+
+
+def test_generate_error_fails_group():
+    class _Failing(_Genius):
+        def generate_batch(self, *args, **kwargs):
+            raise RuntimeError("OOM")
+    
+    async def run():
+        batcher = MicroBatcher(_Failing())
+        batcher.start()
+        try:
+            with pytest.raises(RuntimeError, match="OOM"):
+                await batcher.submit("a")
+        finally:
+            await batcher.stop()
+    
+    asyncio.run(run())
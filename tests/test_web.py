@@ -0,0 +1,71 @@
+"""
+Web arayüzü yardımcı fonksiyon testleri
+"""
+
+import zipfile
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("gradio")
+
+from transformers import AutoTokenizer  # noqa: E402
+
+from web import app  # noqa: E402
+
+
+def test_models_get_separate_tokenizers(monkeypatch, tiny_model_path):
+    """Her model kendi tokenizer örneğini alır; biri diğerinin truncation ayarını değiştirmez"""
+    loads = []
+    
+    def load_tokenizer(model_name):
+        loads.append(model_name)
+        return AutoTokenizer.from_pretrained(tiny_model_path)
+    
+    monkeypatch.setattr(app.CodeGenius, "load_tokenizer", staticmethod(load_tokenizer))
+    app._tokenizer_template.cache_clear()
+    try:
+        first, second = app._tokenizer("1.3b"), app._tokenizer("1.3b")
+    finally:
+        app._tokenizer_template.cache_clear()
+    
+    assert len(loads) == 1
+    assert first is not second
+    assert first._tokenizer is not second._tokenizer
+    
+    first("a b c", truncation=True, max_length=2)
+    assert second._tokenizer.truncation is None
+    assert second("a b c")["input_ids"] == first("a b c")["input_ids"]
+
+
+def test_project_markdown_fence_outlasts_content():
+    markdown = app._project_markdown({"README.md": "```python\nx = 1\n```", "main.py": "print(1)"})
+    
+    assert "\n````md\n```python\nx = 1\n```\n````\n" in markdown
+    assert "\n```py\nprint(1)\n```\n" in markdown
+
+
+def test_project_zip_skips_unsafe_paths():
+    path = app._project_zip({
+        "main.py": "print(1)",
+        "src\\utils.py": "x = 1",
+        "/etc/passwd": "x",
+        "../kacak.py": "x",
+        "C:\\windows\\x.py": "x",
+    })
+    
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ["main.py", "src/utils.py"]
+        assert archive.read("main.py") == b"print(1)"
+
+
+def test_project_zip_keeps_only_recent_archives(monkeypatch):
+    monkeypatch.setattr(app, "MAX_PROJECT_ZIPS", 3)
+    
+    paths = [app._project_zip({"main.py": str(index)}) for index in range(6)]
+    
+    remaining = sorted(Path(app._ZIP_DIR.name).glob("project_*.zip"))
+    assert len(remaining) == 3
+    assert Path(paths[-1]) in remaining and not Path(paths[0]).exists()
@@ -2,106 +2,462 @@
 Gradio Web Arayüzü - AI Code Genius
 """
 
+import importlib.util
+import os
+
+# Rust tabanlı çok parçalı indirici (kuruluysa); huggingface_hub import
+# edilmeden önce ayarlanmalı (gradio ve transformers onu import eder)
+if importlib.util.find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+
 import gradio as gr
+import asyncio
+import copy
+import functools
+import gc
+import inspect
+import io
+import re
 import sys
+import tempfile
+import threading
+import torch
+import zipfile
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
+from huggingface_hub import hf_hub_download, snapshot_download
+from transformers import BitsAndBytesConfig
 
 # Proje kök dizinini ekle
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.model.deepseek import CodeGenius
+from src.inference.batch import ContinuousBatcher
+from src.model.deepseek import CodeGenius, safe_project_path
+from src.model.gguf import LlamaAdapter
+
+# Kalan fp32 matmul'ler (LM head, norm istatistikleri) Ampere ve üstü
+# GPU'larda TF32 tensor core'larında çalışsın
+torch.set_float32_matmul_precision("high")
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+
+
+# Virgülle ayrılmış liste girdileri (ayraç etrafındaki boşluklarla birlikte)
+_CSV = re.compile(r"\s*,\s*")
+
+# Dosya içeriğindeki backtick dizileri (Markdown kod bloğu çiti bunlardan uzun olmalı)
+_BACKTICKS = re.compile(r"`+")
+
+# Proje zip'leri süreç başına tek geçici dizinde tutulur; Gradio dosyayı
+# kendi önbelleğine kopyaladığından yalnızca son birkaç arşiv saklanır
+_ZIP_DIR = tempfile.TemporaryDirectory(prefix="codegenius_")
+MAX_PROJECT_ZIPS = 16
+
+# 8-bit bitsandbytes matmul'ü decode'da 4-bit'ten yavaş olabilir
+INT8_WARNING = "⚠️ 8-bit bitsandbytes üretimde genellikle 4-bit'ten yavaştır"
+
+# Durum mesajları (akış sırasında her parçada yeniden oluşturulmaz)
+_BUSY_CODE = "⏳ Kod üretiliyor..."
+_BUSY_REFACTOR = "⏳ Kod iyileştiriliyor..."
+_BUSY_TESTS = "⏳ Testler üretiliyor..."
+_OK_CODE = "✅ Kod başarıyla üretildi!"
+_OK_CODE_INT8 = f"{_OK_CODE} {INT8_WARNING}"
+_OK_PROJECT = "✅ {} dosya oluşturuldu!"
+_OK_REFACTOR = "✅ Kod iyileştirildi!"
+_OK_TESTS = "✅ Testler oluşturuldu!"
+_OOM_ERROR = "GPU belleği yetersiz: daha küçük model, 4-bit veya daha az token deneyin"
+
+# GPU'ya sığmayan katmanlar için CPU bellek sınırı ve disk offload klasörü
+CPU_MEMORY = "64GiB"
+OFFLOAD_FOLDER = "./offload"
+
+# Bu kadar saniye istek gelmezse batch decode thread'i kapanır
+BATCHER_IDLE_TIMEOUT = 30
+
+# Bellekte tutulan en fazla model sayısı (en uzun süredir kullanılmayan düşer)
+MAX_LOADED_MODELS = 2
 
+# Aynı anda gelen ilk istekler modeli iki kez yüklemesin
+_load_lock = threading.Lock()
 
-# Global model (önbellekleme için)
-genius = None
+# Yüklü modeller (ayar kombinasyonu -> model) ve model başına batcher;
+# model düşünce batcher'ı da durdurulur, yoksa decode thread'i modeli
+# ve VRAM'ini tutmaya devam eder
+_models: "OrderedDict[tuple, CodeGenius]" = OrderedDict()
+_batchers = {}
 
+# Batch'lenemeyen modeller (derlenmiş, llama.cpp) istekleri sırayla işler
+_sequential_lock = asyncio.Lock()
 
-def load_model(model_size, quantization):
-    """Model yükle veya mevcut olanı kullan"""
-    global genius
+
+@lru_cache(maxsize=None)
+def _tokenizer_template(model_size):
+    """Model boyutu başına bir kez yüklenen tokenizer (yalnızca kopyalanır)"""
+    return CodeGenius.load_tokenizer(CodeGenius.MODEL_VARIANTS[model_size])
+
+
+def _tokenizer(model_size):
+    """
+    Her model için ayrı tokenizer kopyası
+    
+    Fast tokenizer'lar truncation/padding ayarlarını her çağrıda kendi
+    iç durumuna yazar; farklı modellerin batcher ve yükleme thread'leri
+    aynı örneği paylaşırsa "Already borrowed" hatası veya yanlış
+    truncation görülür. Dosyalar bir kez okunur, örnekler paylaşılmaz.
+    """
+    return copy.deepcopy(_tokenizer_template(model_size))
+
+
+def _load(
+    model_size, quantization, quant_type="nf4", double_quant=True, compile_model=False, attn_impl=None,
+    gpu_memory=None
+):
+    """Verilen ayarlarla modeli yükle"""
+    # GGUF: llama.cpp'nin k-quant kernelleri (büyük modeller için)
+    if quantization and quantization.startswith("gguf-"):
+        return LlamaAdapter(model_size=model_size, quant_type=quantization[len("gguf-"):])
     
-    if genius is None:
-        quant = None if quantization == "None" else quantization.lower()
-        genius = CodeGenius(model_size=model_size, quantization=quant)
+    bnb_config = None
+    if quantization == "4bit":
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type=quant_type,
+            bnb_4bit_use_double_quant=double_quant,
+            bnb_4bit_compute_dtype=torch.float16
+        )
+    
+    genius = CodeGenius(
+        model_size=model_size,
+        quantization=quantization,
+        bnb_config=bnb_config,
+        compile_model=compile_model,
+        attn_implementation=attn_impl,
+        max_memory={0: f"{gpu_memory}GiB", "cpu": CPU_MEMORY} if gpu_memory else None,
+        offload_folder=OFFLOAD_FOLDER if gpu_memory else None,
+        tokenizer=_tokenizer(model_size)
+    )
+    
+    # Sabit görev talimatlarını yükleme sırasında bir kez prefill et;
+    # sonraki istekler yalnızca kullanıcı girdisini işler
+    for prefix in genius.PROMPT_PREFIXES.values():
+        genius.build_prefix_cache(prefix)
     
     return genius
 
 
-def generate_code(prompt, model_size, quantization, max_tokens, temperature):
-    """Kod üret"""
-    try:
-        model = load_model(model_size, quantization)
+def load_model(
+    model_size, quantization, quant_type="nf4", double_quant=True, compile_model=False, attn_impl="auto",
+    gpu_memory=None
+):
+    """Model yükle veya aynı ayarlarla yüklenmiş olanı kullan"""
+    if quantization == "None":
+        quant = None
+    elif quantization.startswith("gguf-"):
+        quant = quantization
+    else:
+        quant = quantization.lower()
+    
+    # "auto": FlashAttention-2 kuruluysa o, değilse SDPA (CodeGenius seçer)
+    attn_impl = None if attn_impl == "auto" else attn_impl
+    
+    # GPU bellek sınırı yalnızca CUDA'da anlamlı; aşan katmanlar CPU'ya gider.
+    # Kartın belleğine eşit veya üstü sınır hiçbir katmanı taşımaz (fazlası
+    # OOM'a yol açar); bu durumda model doğrudan tek GPU'ya yüklenir
+    if gpu_memory and torch.cuda.is_available():
+        total = torch.cuda.get_device_properties(0).total_memory / 2 ** 30
+        gpu_memory = int(gpu_memory) if int(gpu_memory) < total else None
+    else:
+        gpu_memory = None
+    
+    # 4-bit ayarları yalnızca 4bit modelini etkiler; önbellek anahtarını bölmesin
+    if quant != "4bit":
+        quant_type, double_quant = "nf4", True
+    
+    key = (model_size, quant, quant_type, bool(double_quant), bool(compile_model), attn_impl, gpu_memory)
+    with _load_lock:
+        if key not in _models:
+            # Yeni model yüklenmeden önce yer aç
+            while len(_models) >= MAX_LOADED_MODELS:
+                _, evicted = _models.popitem(last=False)
+                _release(evicted)
+            _models[key] = _load(*key)
         
-        code = model.generate(
-            prompt=prompt,
-            max_tokens=int(max_tokens),
-            temperature=float(temperature)
-        )
+        _models.move_to_end(key)
+        return _models[key]
+
+
+def _release(genius):
+    """Modelin batcher'ını durdur; model referansı bırakılır"""
+    batcher = _batchers.pop(genius, None)
+    if batcher is not None:
+        batcher.close()
+
+
+def _batcher(genius):
+    """
+    Model başına tek batcher: eşzamanlı kullanıcıların istekleri aynı
+    decode adımında birlikte işlenir (ağırlıklar adım başına bir kez okunur)
+    """
+    batcher = _batchers.get(genius)
+    if batcher is None:
+        batcher = ContinuousBatcher(genius, idle_timeout=BATCHER_IDLE_TIMEOUT)
         
-        return code, "✅ Kod başarıyla üretildi!"
+        # Bu arada bellekten atılmış bir model için batcher kaydedilmez
+        if genius in _models.values():
+            _batchers[genius] = batcher
     
-    except Exception as e:
-        return "", f"❌ Hata: {str(e)}"
+    return batcher
 
 
-def generate_project_ui(description, tech_stack, features, model_size):
-    """Proje üret"""
-    try:
-        model = load_model(model_size, "4bit")
+async def _load_async(*model_args):
+    """Modeli event loop'u bloklamadan yükle"""
+    return await asyncio.to_thread(load_model, *model_args)
+
+
+async def _generate_stream(genius, prompt, cache_prefix=None, **params):
+    """
+    Metni üretildikçe döndür
+    
+    Derlenmiş model batcher'a girmez: değişken batch/uzunluklu decode
+    adımları her seferinde yeniden derlemeye yol açar. Bunun yerine
+    istekler sırayla statik cache'li generate yolundan geçer. llama.cpp
+    modeli de HF modeli olmadığından aynı yolu kullanır.
+    """
+    if not (genius.compile_model or isinstance(genius, LlamaAdapter)):
+        async for chunk in _batcher(genius).stream(prompt, cache_prefix=cache_prefix, **params):
+            yield chunk
+        return
+    
+    async with _sequential_lock:
+        chunks = iter(await asyncio.to_thread(genius.generate, prompt, stream=True, **params))
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+async def prefetch_weights(model_size, quantization):
+    """Seçili modelin ağırlıklarını yüklemeden önbelleğe indir"""
+    # Her boyutun her quantization için hazır checkpoint'i yok (ör. 16b AWQ/GGUF)
+    if quantization.startswith("gguf-"):
+        variant = LlamaAdapter.GGUF_VARIANTS.get((model_size, quantization[len("gguf-"):]))
+        if variant is None:
+            raise gr.Error(f"{model_size} için {quantization} checkpoint'i bulunamadı")
         
-        tech_list = [t.strip() for t in tech_stack.split(',')]
-        feature_list = [f.strip() for f in features.split(',')]
+        repo_id, filename = variant
+        await asyncio.to_thread(hf_hub_download, repo_id, filename)
+    else:
+        variants = CodeGenius.AWQ_VARIANTS if quantization == "AWQ" else CodeGenius.MODEL_VARIANTS
+        repo_id = variants.get(model_size)
+        if repo_id is None:
+            raise gr.Error(f"{model_size} için {quantization} checkpoint'i bulunamadı")
         
-        files = model.generate_project(
-            description=description,
-            tech_stack=tech_list,
-            features=feature_list
+        await asyncio.to_thread(
+            snapshot_download,
+            repo_id,
+            allow_patterns=["*.safetensors", "*.json", "*.py", "tokenizer*"]
         )
-        
-        # Dosyaları formatla
-        output = ""
-        for filepath, content in files.items():
-            output += f"\n{'='*60}\n"
-            output += f"📁 {filepath}\n"
-            output += f"{'='*60}\n\n"
-            output += content + "\n"
-        
-        return output, f"✅ {len(files)} dosya oluşturuldu!"
     
-    except Exception as e:
-        return "", f"❌ Hata: {str(e)}"
+    return f"📥 {repo_id} indirildi"
 
 
-def refactor_code_ui(code, requirements, model_size):
-    """Kod iyileştir"""
-    try:
-        model = load_model(model_size, "4bit")
-        
-        req_list = [r.strip() for r in requirements.split(',')]
-        
-        improved = model.refactor(code, req_list)
-        
-        return improved, "✅ Kod iyileştirildi!"
+def unload_models():
+    """Yüklü modelleri bellekten at ve VRAM'i serbest bırak"""
+    with _load_lock:
+        for genius in list(_batchers):
+            _release(genius)
+        _models.clear()
+    gc.collect()
+    
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
     
-    except Exception as e:
-        return "", f"❌ Hata: {str(e)}"
+    return "🗑️ Yüklü modeller bellekten kaldırıldı"
 
 
-def generate_tests_ui(code, framework, model_size):
-    """Test üret"""
-    try:
-        model = load_model(model_size, "4bit")
-        
-        tests = model.generate_tests(code, framework=framework)
+def _error_boundary(handler):
+    """
+    OOM'u arayüzde gösterilen gr.Error'a çevir
+    
+    PyTorch'un önbellekte tuttuğu boş VRAM blokları serbest bırakılır; aksi
+    halde sonraki istekler de aynı hatayı alır. Diğer hatalar olduğu gibi
+    yükselir (Gradio gösterir, traceback sunucu loguna düşer).
+    """
+    def out_of_memory():
+        torch.cuda.empty_cache()
+        return gr.Error(_OOM_ERROR)
+    
+    if inspect.isasyncgenfunction(handler):
+        @functools.wraps(handler)
+        async def stream_wrapper(*args):
+            try:
+                async for outputs in handler(*args):
+                    yield outputs
+            except torch.cuda.OutOfMemoryError:
+                raise out_of_memory()
         
-        return tests, "✅ Testler oluşturuldu!"
+        return stream_wrapper
+    
+    @functools.wraps(handler)
+    async def wrapper(*args):
+        try:
+            return await handler(*args)
+        except torch.cuda.OutOfMemoryError:
+            raise out_of_memory()
     
-    except Exception as e:
-        return "", f"❌ Hata: {str(e)}"
+    return wrapper
+
+
+async def _stream_text(chunks):
+    """Metin parçalarını biriktirip her adımda o ana kadarki metni ver"""
+    text = ""
+    async for chunk in chunks:
+        text += chunk
+        yield text
+
+
+def _project_markdown(files):
+    """Her dosyayı başlık + kod bloğu olarak Markdown'a yaz"""
+    buf = io.StringIO()
+    for filepath, content in files.items():
+        # İçerikteki en uzun backtick dizisinden uzun çit, bloğu erken kapatmaz
+        fence = "`" * max(3, max(map(len, _BACKTICKS.findall(content)), default=0) + 1)
+        buf.write(f"\n\n## 📁 {filepath}\n\n{fence}{Path(filepath).suffix.lstrip('.')}\n")
+        buf.write(content)
+        buf.write(f"\n{fence}\n")
+    
+    return buf.getvalue()
+
+
+def _project_zip(files):
+    """Proje dosyalarını indirilebilir bir zip arşivine yaz"""
+    # Eski arşivleri sil; dizinde yalnızca son MAX_PROJECT_ZIPS kalır
+    archives = sorted(Path(_ZIP_DIR.name).glob("project_*.zip"), key=os.path.getmtime)
+    for old in archives[:max(0, len(archives) - MAX_PROJECT_ZIPS + 1)]:
+        old.unlink(missing_ok=True)
+    
+    with tempfile.NamedTemporaryFile(prefix="project_", suffix=".zip", dir=_ZIP_DIR.name, delete=False) as tmp:
+        with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as archive:
+            for filepath, content in files.items():
+                arcname = safe_project_path(filepath)
+                if arcname:
+                    archive.writestr(arcname, content)
+    
+    return tmp.name
+
+
+@_error_boundary
+async def generate_code(
+    prompt, model_size, quantization, quant_type, double_quant, compile_model, attn_impl, gpu_memory,
+    max_tokens, temperature, top_p, top_k, repetition_penalty
+):
+    """Kod üret (token'lar üretildikçe gösterilir)"""
+    model = await _load_async(
+        model_size, quantization, quant_type, double_quant, compile_model, attn_impl, gpu_memory
+    )
+    
+    code = ""
+    async for code in _stream_text(_generate_stream(
+        model,
+        prompt,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        top_p=top_p,
+        top_k=top_k,
+        repetition_penalty=repetition_penalty
+    )):
+        yield code, _BUSY_CODE
+    
+    yield code.strip(), _OK_CODE_INT8 if quantization == "8bit" else _OK_CODE
+
+
+@_error_boundary
+async def generate_project_ui(
+    description, tech_stack, features, model_size, quantization, quant_type, double_quant, compile_model,
+    attn_impl, gpu_memory
+):
+    """Proje üret"""
+    model = await _load_async(
+        model_size, quantization, quant_type, double_quant, compile_model, attn_impl, gpu_memory
+    )
+    
+    tech_list = _CSV.split(tech_stack.strip())
+    feature_list = _CSV.split(features.strip())
+    
+    chunks = [chunk async for chunk in _generate_stream(
+        model,
+        model._project_prompt(description, tech_list, feature_list),
+        cache_prefix=model.PROMPT_PREFIXES["project"],
+        **model.TASK_PARAMS["project"]
+    )]
+    
+    files = model._parse_project_files("".join(chunks))
+    
+    return _project_markdown(files), _project_zip(files), _OK_PROJECT.format(len(files))
+
+
+@_error_boundary
+async def refactor_code_ui(
+    code, requirements, model_size, quantization, quant_type, double_quant, compile_model, attn_impl,
+    gpu_memory
+):
+    """Kod iyileştir (token'lar üretildikçe gösterilir)"""
+    model = await _load_async(
+        model_size, quantization, quant_type, double_quant, compile_model, attn_impl, gpu_memory
+    )
+    
+    req_list = _CSV.split(requirements.strip())
+    
+    improved = ""
+    async for improved in _stream_text(_generate_stream(
+        model,
+        model._refactor_prompt(code, req_list),
+        cache_prefix=model.PROMPT_PREFIXES["refactor"],
+        **model.TASK_PARAMS["refactor"]
+    )):
+        yield improved, _BUSY_REFACTOR
+    
+    yield improved.strip(), _OK_REFACTOR
+
+
+@_error_boundary
+async def generate_tests_ui(
+    code, framework, model_size, quantization, quant_type, double_quant, compile_model, attn_impl,
+    gpu_memory
+):
+    """Test üret (token'lar üretildikçe gösterilir)"""
+    model = await _load_async(
+        model_size, quantization, quant_type, double_quant, compile_model, attn_impl, gpu_memory
+    )
+    
+    tests = ""
+    async for tests in _stream_text(_generate_stream(
+        model,
+        model._tests_prompt(code, framework),
+        cache_prefix=model.PROMPT_PREFIXES["tests"],
+        **model.TASK_PARAMS["tests"]
+    )):
+        yield tests, _BUSY_TESTS
+    
+    yield tests.strip(), _OK_TESTS
+
+
+def warmup():
+    """
+    Varsayılan modeli açılışta yükleyip tek token üret
+    
+    Ağırlık yükleme ve CUDA kernel seçimi (compile açıksa derleme de) ilk
+    kullanıcı isteği yerine sunucu başlarken yapılır. Ayarlar arayüzün
+    varsayılanlarıyla aynıdır; ilk istek aynı model önbelleğini kullanır.
+    """
+    genius = load_model("6.7b", "4bit", "nf4", True, False, "auto", 0)
+    genius.generate("warm", max_tokens=1, temperature=0.7)
 
 
 # Gradio Arayüzü
-with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
+with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft(), analytics_enabled=False) as app:
     
     gr.Markdown("""
     # 🚀 AI Code Genius
@@ -116,10 +472,31 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
             label="Model Boyutu"
         )
         quantization = gr.Dropdown(
-            choices=["4bit", "8bit", "None"],
+            choices=["4bit", "8bit", "AWQ", "gguf-q4_K_M", "gguf-q5_K_M", "None"],
             value="4bit",
             label="Quantization"
         )
+        quant_type = gr.Dropdown(
+            choices=["nf4", "fp4"],
+            value="nf4",
+            label="4-bit Tipi"
+        )
+        double_quant = gr.Checkbox(value=True, label="Double Quant")
+        attn_impl = gr.Dropdown(
+            choices=["auto", "flash_attention_2", "sdpa", "eager"],
+            value="auto",
+            label="Attention"
+        )
+        # İlk yüklemede derleme süresi eklenir; istekler batch'lenmez
+        compile_model = gr.Checkbox(value=False, label="Compile")
+        # Kartın belleğine göre ayarlayın; sığmayan katmanlar CPU'ya offload edilir
+        gpu_memory = gr.Slider(minimum=0, maximum=80, value=0, step=1, label="GPU GiB (0: sınırsız)")
+        prefetch_btn = gr.Button("📥 Ağırlıkları İndir")
+        unload_btn = gr.Button("🗑️ Modeli Boşalt")
+        model_status = gr.Textbox(label="Model Durumu", interactive=False)
+    
+    prefetch_btn.click(prefetch_weights, inputs=[model_size, quantization], outputs=model_status)
+    unload_btn.click(unload_models, outputs=model_status)
     
     # Tab'lar
     with gr.Tabs():
@@ -143,13 +520,36 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
                             label="Max Tokens"
                         )
                         temperature = gr.Slider(
-                            minimum=0.1,
+                            minimum=0.0,
                             maximum=1.0,
                             value=0.7,
                             step=0.1,
                             label="Temperature"
                         )
                     
+                    with gr.Row():
+                        top_p = gr.Slider(
+                            minimum=0.1,
+                            maximum=1.0,
+                            value=0.95,
+                            step=0.05,
+                            label="Top-p"
+                        )
+                        top_k = gr.Slider(
+                            minimum=0,
+                            maximum=200,
+                            value=50,
+                            step=1,
+                            label="Top-k (0: kapalı)"
+                        )
+                        repetition_penalty = gr.Slider(
+                            minimum=1.0,
+                            maximum=2.0,
+                            value=1.0,
+                            step=0.05,
+                            label="Repetition Penalty"
+                        )
+                    
                     generate_btn = gr.Button("🚀 Kod Üret", variant="primary")
                 
                 with gr.Column():
@@ -158,8 +558,13 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
             
             generate_btn.click(
                 generate_code,
-                inputs=[prompt_input, model_size, quantization, max_tokens, temperature],
-                outputs=[code_output, status_1]
+                inputs=[
+                    prompt_input, model_size, quantization, quant_type, double_quant,
+                    compile_model, attn_impl, gpu_memory, max_tokens, temperature,
+                    top_p, top_k, repetition_penalty
+                ],
+                outputs=[code_output, status_1],
+                show_progress="hidden"
             )
         
         # Tab 2: Proje Üretimi
@@ -185,13 +590,17 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
                     project_btn = gr.Button("🏗️ Proje Oluştur", variant="primary")
                 
                 with gr.Column():
-                    project_output = gr.Code(label="Proje Dosyaları", language="markdown")
+                    project_output = gr.Markdown(label="Proje Dosyaları")
+                    project_zip = gr.File(label="Projeyi İndir (.zip)")
                     status_2 = gr.Textbox(label="Durum", interactive=False)
             
             project_btn.click(
                 generate_project_ui,
-                inputs=[project_desc, project_tech, project_features, model_size],
-                outputs=[project_output, status_2]
+                inputs=[
+                    project_desc, project_tech, project_features, model_size, quantization, quant_type,
+                    double_quant, compile_model, attn_impl, gpu_memory
+                ],
+                outputs=[project_output, project_zip, status_2]
             )
         
         # Tab 3: Kod İyileştirme
@@ -217,8 +626,12 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
             
             refactor_btn.click(
                 refactor_code_ui,
-                inputs=[code_input, refactor_reqs, model_size],
-                outputs=[refactored_output, status_3]
+                inputs=[
+                    code_input, refactor_reqs, model_size, quantization, quant_type, double_quant,
+                    compile_model, attn_impl, gpu_memory
+                ],
+                outputs=[refactored_output, status_3],
+                show_progress="hidden"
             )
         
         # Tab 4: Test Üretimi
@@ -244,8 +657,12 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
             
             test_btn.click(
                 generate_tests_ui,
-                inputs=[test_code_input, test_framework, model_size],
-                outputs=[test_output, status_4]
+                inputs=[
+                    test_code_input, test_framework, model_size, quantization, quant_type, double_quant,
+                    compile_model, attn_impl, gpu_memory
+                ],
+                outputs=[test_output, status_4],
+                show_progress="hidden"
             )
     
     # Footer
@@ -259,8 +676,15 @@ with gr.Blocks(title="AI Code Genius", theme=gr.themes.Soft()) as app:
 
 
 if __name__ == "__main__":
+    if os.environ.get("AI_CG_WARMUP") == "1":
+        warmup()
+    
+    # Eşzamanlı istekler batcher'da aynı decode adımına girebilsin;
+    # kuyruk sınırı aşırı yükte bekleyen istek birikmesini önler
+    app.queue(default_concurrency_limit=8, max_size=64)
     app.launch(
         server_name="0.0.0.0",
         server_port=7860,
-        share=False
+        share=False,
+        show_error=True
     )